@@ -0,0 +1,262 @@
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import numpy as np
+from vector import Vector2
+from physics_objects import Particle, Circle, Wall, Polygon, KINEMATIC
+from contact import generate_contact, resolve_contact, resolve_bumper_contact
+from forces import Gravity, AirDrag, SpringForce, SpringRepulsion, SpringNetwork
+from particle_system import ParticleSystem
+from narrowphase import circle_polygon_contacts, VertexBuffer
+from world import World, Inputs, play_width, status_offset, height
+from table import create_flipper
+from timers import TimerWheel
+
+# Headless benchmarks for the physics and contact code.
+#
+#   python benchmark.py                          run everything and print the time per call
+#   python benchmark.py -k contact               only the benchmarks with "contact" in their name
+#   python benchmark.py --save baseline.json     also write the results out
+#   python benchmark.py --compare baseline.json  flag anything slower than the baseline by more than --threshold
+#
+# Every benchmark is a setup function that builds what it needs and returns the thing to time. The setup runs
+# again before each sample, so every sample starts from the same state, and the random ones are seeded.
+
+benchmarks = []
+
+# number is how many calls make up one sample, max_repeat caps the samples for the really slow ones
+def benchmark(name, number=1000, max_repeat=None):
+    def register(setup):
+        benchmarks.append((name, setup, number, max_repeat))
+        return setup
+    return register
+
+def ball(x, y, vx=0, vy=0):
+    return Circle(mass=1, radius=9, pos=(x, y), vel=(vx, vy))
+
+def balls(count, seed=1):
+    rng = random.Random(seed)
+    return [ball(rng.uniform(0, 500), rng.uniform(0, 500), rng.uniform(-50, 50), rng.uniform(-50, 50))
+            for _ in range(count)]
+
+## Bodies
+@benchmark("particle_update", 20000)
+def particle_update():
+    particle = Particle(mass=1, pos=(100, 100), vel=(10, 0))
+    particle.add_force(Vector2(0, 490))
+    return lambda: particle.update(1/240)
+
+@benchmark("polygon_update", 5000)
+def polygon_update():
+    flipper = create_flipper(90, 20, (400, 860), False, 0.4)
+    flipper.avel = 1
+    return lambda: flipper.update(1/240)
+
+# The three moving polygons of the table, turning every step and posed together
+@benchmark("vertex_buffer_transform_3", 5000)
+def vertex_buffer_transform():
+    polygons = [create_flipper(90, 20, (400 + 100 * i, 860), i == 1, 0.4) for i in range(3)]
+    edges = VertexBuffer(polygons)
+    def run():
+        for polygon in polygons:
+            polygon.angle += 0.01
+        edges.transform()
+    return run
+
+@benchmark("particle_system_integrate_1000", 1000)
+def particle_system_integrate():
+    system = ParticleSystem()
+    for obj in balls(1000):
+        system.add(obj)
+    return lambda: system.integrate(1/240)
+
+## Contacts | each call builds the contact from scratch and resolves it, with the bodies put back first
+# (as fresh copies, resolving moves the ones it is given) | every call has to find them touching, or it would
+# only be timing the early out
+def contact_benchmark(a, b, resolve):
+    start = [(obj, Vector2(obj.pos), Vector2(obj.vel)) for obj in (a, b)]
+    def run():
+        for obj, pos, vel in start:
+            obj.pos = Vector2(pos)
+            obj.vel = Vector2(vel)
+        if not resolve(generate_contact(a, b)):
+            raise RuntimeError("contact benchmark bodies aren't touching")
+    return run
+
+@benchmark("contact_circle_circle")
+def contact_circle_circle():
+    return contact_benchmark(ball(100, 100, 50, 0), ball(115, 100), lambda c: resolve_contact(c, 0.1))
+
+@benchmark("contact_circle_wall")
+def contact_circle_wall():
+    wall = Wall(point1=Vector2(0, 200), point2=Vector2(500, 200))
+    return contact_benchmark(ball(100, 205, 0, -50), wall, lambda c: resolve_contact(c, 0.3))
+
+@benchmark("contact_circle_polygon")
+def contact_circle_polygon():
+    box = Polygon(pos=(100, 200), offsets=[(-50, -10), (50, -10), (50, 10), (-50, 10)])
+    return contact_benchmark(ball(110, 185, 0, 50), box, lambda c: resolve_contact(c, 0.3))
+
+@benchmark("contact_circle_polygon_vertex")
+def contact_circle_polygon_vertex():
+    box = Polygon(pos=(100, 200), offsets=[(-50, -10), (50, -10), (50, 10), (-50, 10)])
+    return contact_benchmark(ball(155, 185, -20, 50), box, lambda c: resolve_contact(c, 0.3))
+
+@benchmark("contact_bumper")
+def contact_bumper():
+    bumper = Circle(radius=20, pos=(100, 100))
+    return contact_benchmark(ball(125, 100, -50, 0), bumper, lambda c: resolve_bumper_contact(c, 1))
+
+# Every ball against every polygon of the table in one batched call
+@benchmark("circle_polygon_kernel_100x_table", 100)
+def circle_polygon_kernel():
+    world = World()
+    rng = random.Random(1)
+    centers = [(rng.uniform(60, play_width), rng.uniform(status_offset, height)) for _ in range(100)]
+    return lambda: circle_polygon_contacts(centers, 9, world.wall_edges)
+
+## Forces on 100 balls
+@benchmark("gravity_100", 1000)
+def gravity():
+    return Gravity(objects_list=balls(100), acc=(0, 490)).apply
+
+@benchmark("gravity_system_1000", 1000)
+def gravity_system():
+    system = ParticleSystem()
+    for obj in balls(1000):
+        system.add(obj)
+    return Gravity(system=system, acc=(0, 490)).apply
+
+@benchmark("air_drag_100", 1000)
+def air_drag():
+    return AirDrag(wind=Vector2(0, 0), objects_list=balls(100)).apply
+
+@benchmark("spring_force_chain_100", 1000)
+def spring_force():
+    objs = balls(100)
+    return SpringForce(pairs_list=list(zip(objs, objs[1:]))).apply
+
+@benchmark("spring_network_chain_1000", 1000)
+def spring_network():
+    system = ParticleSystem()
+    objs = balls(1000)
+    for obj in objs:
+        system.add(obj)
+    return SpringNetwork(system, list(zip(objs, objs[1:])), l=None).apply
+
+@benchmark("spring_repulsion_100", 20)
+def spring_repulsion():
+    return SpringRepulsion(balls(100)).apply
+
+@benchmark("spring_repulsion_cutoff_100", 200)
+def spring_repulsion_cutoff():
+    return SpringRepulsion(balls(100), cutoff=18, skin=4).apply
+
+## Timers | 10000 waiting, spread over the next 10 minutes, a few coming due each step
+@benchmark("timer_wheel_advance_10000", 2000)
+def timer_wheel_advance():
+    wheel = TimerWheel({"tick": lambda: None})
+    rng = random.Random(1)
+    for _ in range(10000):
+        wheel.every(rng.uniform(1, 600), "tick")
+    return lambda: wheel.advance(1/240)
+
+## The whole table | the normal ball plus count - 1 more dropped around the playfield
+def table(count, seed=1):
+    world = World()
+    rng = random.Random(seed)
+    for _ in range(count - 1):
+        world.add_ball((rng.uniform(60, play_width - 60), rng.uniform(status_offset + 30, height - 300)))
+    inputs = Inputs(left_flipper=True, right_flipper=True)
+    return lambda: world.step(1/240, inputs)
+
+@benchmark("table_step_1", 200)
+def table_step_1():
+    return table(1)
+
+@benchmark("table_step_10", 100)
+def table_step_10():
+    return table(10)
+
+@benchmark("table_step_100", 10)
+def table_step_100():
+    return table(100)
+
+@benchmark("table_step_1000", 1, max_repeat=1)
+def table_step_1000():
+    return table(1000)
+
+# Seconds per call for one benchmark | (best sample, median sample)
+def measure(setup, number, repeat):
+    samples = []
+    for _ in range(repeat):
+        run = setup()
+        # One call first so imports and caches don't land in the timing
+        if number > 1:
+            run()
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        samples.append((time.perf_counter() - start) / number)
+    return min(samples), float(np.median(samples))
+
+def run_benchmarks(pattern="", repeat=5):
+    results = {}
+    for name, setup, number, max_repeat in benchmarks:
+        if pattern not in name:
+            continue
+        count = repeat if max_repeat is None else min(repeat, max_repeat)
+        best, median = measure(setup, number, count)
+        results[name] = {"seconds": best, "median": median, "number": number, "repeat": count}
+        print(f"{name:36} {best * 1e6:12.2f} us   (median {median * 1e6:.2f} us)", flush=True)
+    return results
+
+# Names that got slower than the baseline by more than threshold (0.1 = 10%)
+def compare(results, baseline, threshold):
+    regressions = []
+    print()
+    print(f"{'benchmark':36} {'baseline us':>12} {'now us':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:36} {'-':>12} {result['seconds'] * 1e6:12.2f}      new")
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:36} {before['seconds'] * 1e6:12.2f} {result['seconds'] * 1e6:12.2f} {change:+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless physics benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks with this in their name")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark (the best one is kept)")
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--compare", help="baseline json to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.pattern, args.repeat)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"meta": {"python": platform.python_version(),
+                                "numpy": np.__version__,
+                                "machine": platform.machine(),
+                                "platform": platform.platform(),
+                                "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+                       "results": results}, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
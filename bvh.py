@@ -0,0 +1,119 @@
+# Bounding volume hierarchy (AABB tree) over shapes that never move.
+# Built once at setup, then queried with a box to get the few shapes that could be touching it.
+#
+# Boxes are tuples (xmin, ymin, xmax, ymax), the same thing aabb() returns on the physics objects.
+# The tree is stored flat (one list entry per node) so it is cheap to walk and easy to save to disk.
+
+def union_box(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def boxes_overlap(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+# Box covering a circle moving from pos to pos + displacement, grown by margin on every side
+def swept_box(pos, radius, displacement, margin=0):
+    r = radius + margin
+    x0 = pos[0]
+    y0 = pos[1]
+    x1 = x0 + displacement[0]
+    y1 = y0 + displacement[1]
+    return (min(x0, x1) - r, min(y0, y1) - r, max(x0, x1) + r, max(y0, y1) + r)
+
+class BVH:
+    def __init__(self, items=[], leaf_size=2):
+        self.items = list(items)
+        self.leaf_size = leaf_size
+
+        # Shapes without a box (infinite walls) can't go in the tree, every query returns them
+        self.unbounded = []
+        bounded = []
+        self.item_boxes = []
+        for i, item in enumerate(self.items):
+            box = item.aabb()
+            self.item_boxes.append(box)
+            if box is None:
+                self.unbounded.append(i)
+            else:
+                bounded.append(i)
+
+        # Node arrays | node i covers boxes[i]
+        # Inner nodes have two children, leaves have left == -1 and own order[first:first+count]
+        self.boxes = []
+        self.left = []
+        self.right = []
+        self.first = []
+        self.count = []
+        self.order = []
+        if bounded:
+            self.build(bounded)
+
+    # Everything the tree is made of, as plain lists | what BVH.from_flat takes back
+    def flat(self):
+        return {"boxes": self.boxes, "left": self.left, "right": self.right, "first": self.first,
+                "count": self.count, "order": self.order, "unbounded": self.unbounded}
+
+    # A tree that was already built for these items (a compiled table), without building it again
+    @classmethod
+    def from_flat(cls, items, flat, leaf_size=2):
+        tree = cls.__new__(cls)
+        tree.items = list(items)
+        tree.leaf_size = leaf_size
+        tree.item_boxes = [item.aabb() for item in tree.items]
+        for name in ("boxes", "left", "right", "first", "count", "order", "unbounded"):
+            setattr(tree, name, list(flat[name]))
+        return tree
+
+    def build(self, indices):
+        # Make the node first so the root is always node 0
+        node = len(self.boxes)
+        box = self.item_boxes[indices[0]]
+        for i in indices[1:]:
+            box = union_box(box, self.item_boxes[i])
+        self.boxes.append(box)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.first.append(len(self.order))
+        self.count.append(0)
+
+        if len(indices) <= self.leaf_size:
+            self.order.extend(indices)
+            self.count[node] = len(indices)
+            return node
+
+        # Split down the middle of the longest axis, sorted by box centers
+        axis = 0 if (box[2] - box[0]) >= (box[3] - box[1]) else 1
+        indices = sorted(indices, key=lambda i: self.item_boxes[i][axis] + self.item_boxes[i][axis + 2])
+        half = len(indices) // 2
+        self.left[node] = self.build(indices[:half])
+        self.right[node] = self.build(indices[half:])
+        return node
+
+    # Returns the index of every item whose box overlaps the query box, in the order the items were given
+    def query_indices(self, box):
+        found = list(self.unbounded)
+        if not self.boxes:
+            return found
+
+        boxes = self.boxes
+        left = self.left
+        right = self.right
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not boxes_overlap(boxes[node], box):
+                continue
+            if left[node] == -1:
+                first = self.first[node]
+                for i in self.order[first:first + self.count[node]]:
+                    if boxes_overlap(self.item_boxes[i], box):
+                        found.append(i)
+            else:
+                stack.append(right[node])
+                stack.append(left[node])
+
+        # Keep the original order so contacts resolve in the same order as a plain loop would
+        found.sort()
+        return found
+
+    def query(self, box):
+        return [self.items[i] for i in self.query_indices(box)]
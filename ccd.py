@@ -0,0 +1,92 @@
+import math
+
+# Continuous collision detection for circles (balls).
+# A ball that moves further than its own radius in one step can skip straight over a thin wall, because the
+# contacts only look at where the ball is, not where it went. These sweep the ball's circle along its
+# displacement for the step and find the first time it touches a shape.
+#
+# Every function takes the ball's start position p, its displacement d for the whole step and its radius r,
+# and returns (t, normal) for the first touch, with t between 0 (start) and 1 (end), or None if it never touches.
+# The normal points away from the shape, towards the ball. Balls that already overlap at the start are
+# left alone here, the normal contacts deal with them.
+
+# Infinite wall
+def toi_circle_wall(p, d, r, wall):
+    n = wall.normal
+    gap = (p[0] - wall.pos.x) * n.x + (p[1] - wall.pos.y) * n.y - r
+    closing = d[0] * n.x + d[1] * n.y
+    if gap < 0 or closing >= 0:
+        return None
+    t = gap / -closing
+    if t > 1:
+        return None
+    return t, (n.x, n.y)
+
+# A point, or a circle of radius radius - r around it
+def toi_circle_point(p, d, radius, q):
+    fx = p[0] - q[0]
+    fy = p[1] - q[1]
+    a = d[0] * d[0] + d[1] * d[1]
+    b = 2 * (fx * d[0] + fy * d[1])
+    c = fx * fx + fy * fy - radius * radius
+    # Already touching, or moving away
+    if c < 0 or b >= 0 or a == 0:
+        return None
+    disc = b * b - 4 * a * c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / (2 * a)
+    if t > 1:
+        return None
+    hx = fx + t * d[0]
+    hy = fy + t * d[1]
+    length = math.hypot(hx, hy)
+    return t, (hx / length, hy / length)
+
+# One side of a polygon, from a to b with outward normal n. Hits past the ends are left to the vertices.
+def toi_circle_segment(p, d, r, a, b, n):
+    gap = (p[0] - a.x) * n.x + (p[1] - a.y) * n.y - r
+    closing = d[0] * n.x + d[1] * n.y
+    if gap < 0 or closing >= 0:
+        return None
+    t = gap / -closing
+    if t > 1:
+        return None
+    # Where the circle is touching the side's line, and is that between the two ends
+    cx = p[0] + t * d[0] - n.x * r
+    cy = p[1] + t * d[1] - n.y * r
+    ex = b.x - a.x
+    ey = b.y - a.y
+    length2 = ex * ex + ey * ey
+    if length2 == 0:
+        return None
+    u = ((cx - a.x) * ex + (cy - a.y) * ey) / length2
+    if u < 0 or u > 1:
+        return None
+    return t, (n.x, n.y)
+
+def toi_circle_polygon(p, d, r, polygon):
+    first = None
+    points = polygon.points
+    normals = polygon.normals
+    for i in range(len(points)):
+        hit = toi_circle_segment(p, d, r, points[i - 1], points[i], normals[i])
+        if hit is not None and (first is None or hit[0] < first[0]):
+            first = hit
+        hit = toi_circle_point(p, d, r, points[i])
+        if hit is not None and (first is None or hit[0] < first[0]):
+            first = hit
+    return first
+
+def toi_circle_circle(p, d, r, circle):
+    return toi_circle_point(p, d, r + circle.radius, circle.pos)
+
+toi_functions = {
+    "Circle": toi_circle_circle,
+    "Polygon": toi_circle_polygon,
+    "Wall": toi_circle_wall,
+}
+
+# First touch between a ball moving by d and any shape | returns (t, normal) or None
+def time_of_impact(p, d, r, shape):
+    return toi_functions[shape.contact_type](p, d, r, shape)
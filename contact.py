@@ -1,113 +1,218 @@
-from typing import overload
-from pygame.math import Vector2
+from vector import Vector2
 import math
 
 # Returns a new contact object of the correct type
-# This function has been done for you.
 def generate_contact(a, b):
-    # Check if a's type comes later than b's alphabetically.
-    # We will label our collision types in alphabetical order, 
-    # so the lower one needs to go first.
-    if b.contact_type < a.contact_type:
-        a, b = b, a
-    # This calls the class of the appropriate name based on the two contact types.
-    return globals()[f"Contact_{a.contact_type}_{b.contact_type}"](a, b)
+    # contact_table knows the class for every pair of contact types, in either order,
+    # and whether a and b have to be swapped to match it (see the bottom of this file)
+    contact_class, swap = contact_table[(a.contact_type, b.contact_type)]
+    if swap:
+        return contact_class(b, a)
+    return contact_class(a, b)
     
+# Speed along the normal that a bumper sends the ball away at
+bumper_rebound_speed = 300
+
+# Passes resolve_contacts makes over the resting contacts | the first one pushes them apart and bounces them,
+# the rest only even out the impulses between contacts that share a body (a ball on a flipper and a wall)
+solver_iterations = 4
+
 # Resolves a contact (by the default method) and returns True if it needed to be resolved
 def resolve_contact(contact, restitution=0):
-    a = contact.a
-    b = contact.b
-    n = contact.normal() # n^ = normal    
+    return resolve(contact, restitution, 0, 0)
+
+def resolve_bumper_contact(contact, rebound_strength):
+    return resolve(contact, 0, 0, bumper_rebound_speed * rebound_strength)
+
+# One contact, with the values for its pair of materials (see materials.py), rebound being a speed
+def resolve(contact, restitution, friction, rebound):
     d = contact.overlap() # d = overlap
-    p = contact.point() # Point of contact
-    # Resolve the overlap
     # Resolve only if overlap > 0
     if (d > 0):
-        m = 1/(1/a.mass + 1/b.mass)
-        # m = 1 / (1/ma + 1/mb)
-        contact.a.pos += (m/a.mass) * d * n
-        # translate a by (m/ma)*dn^ 
-        contact.b.pos += -(m/b.mass) * d * n
-        # translate b by -((m/ma)*dn^)
-
-        # Resolve velocity at the point of contact
-        # VatContact
-        Va = a.vel
-        Sa = p - a.pos
-        Wa = a.avel
-        SaT = Vector2(-Sa.y, Sa.x)
-        # v - relative velocity 
-        VaContact = Va + Wa * SaT
-
-        Vb = b.vel
-        Sb = p - b.pos
-        Wb = b.avel
-        SbT = Vector2(-Sb.y, Sb.x)
-        VbContact = Vb + Wb * SbT
-
-        # resolve velocity
-        v = VaContact - VbContact
-
-        # v = a.vel - b.vel        
-        if(v.dot(n) < 0): # only resolve velocity if ->v * n^ < 0 (means objects are moving towards each other)
-            # relative velocity ->v = va - vb
-            j = -(1 + restitution) * m * (v.dot(n)) 
-            # J = -(1 + E)m(->V*n^)
-            J = j * n
-            # ->J = Jn^
-            a.impulse(J) # a.impulse(->J)
-            b.impulse(-J) # b.impulse(->-J)
+        j = separate(contact, d, restitution, friction, rebound)
+        # Remembered so the ContactManager can warm start this contact next step
+        # (not for a kick, which isn't a resting contact worth carrying over)
+        if not rebound:
+            contact.impulse = j
+    # True if the bodies were actually touching
+    return d > 0
 
-def resolve_bumper_contact(contact, rebound_strength):
+# The contact kernel: every contact of a step, walls, flippers, bumpers and balls alike, each with the values
+# for its pair of materials from pairs (MaterialTable.pairs).
+# Kept contacts that don't kick are all warm started first (manager, a ContactManager). The first pass then
+# pushes every contact apart and bounces it (kicks included), and the passes after that go over the ones that
+# don't kick again. Each pass only adds what a contact still needs, with the impulse it has taken this step
+# (contact.impulse) never going below 0, so the contacts on one body settle between them, starting from last
+# step's answer instead of from nothing.
+# Returns (how many were touching, points scored)
+def resolve_contacts(contacts, pairs, manager, iterations=solver_iterations):
+    resolved = 0
+    score = 0
+    values = [pairs[contact.a.material][contact.b.material] for contact in contacts]
+    # The speed each pair meets at before anything is done to it this step, for its bounce
+    approach = [normal_speed(contact) if not rebound and contact.overlap() > 0 else 0
+                for contact, (restitution, friction, rebound, points) in zip(contacts, values)]
+    for contact, (restitution, friction, rebound, points) in zip(contacts, values):
+        if not rebound:
+            manager.warm_start(contact)
+    resting = []
+    for contact, (restitution, friction, rebound, points), vn in zip(contacts, values, approach):
+        d = contact.overlap()
+        if d >= 0:
+            score += points
+        if d > 0:
+            if rebound:
+                j = separate(contact, d, restitution, friction, rebound)
+            else:
+                j = separate(contact, d, restitution, friction, rebound, contact.impulse, vn)
+            if not rebound:
+                contact.impulse = j
+                resting.append((contact, friction))
+            resolved += 1
+    for i in range(iterations - 1):
+        for contact, friction in resting:
+            relax(contact, friction)
+    return resolved, score
+
+# Pushes a touching pair apart and bounces them, and returns the impulse it took along the normal (0 if they
+# were already moving apart). The bounce is -(1 + E) (restitution) times the speed they meet at, or with a
+# rebound, the speed they meet at plus the rebound (bumpers). Friction then takes away as much of their sliding
+# along the surface as it can, up to friction times that impulse. Everything is plain floats, so resolving a
+# contact makes no Vector2s at all.
+# applied is what a warm start already pushed them apart with this step, and approach the speed along the
+# normal they met at before it (the speed they meet at now, if not given). The bounce is worked out from
+# approach, only the difference from applied is added, and the total is never less than 0 | a warm start that
+# pushed too hard is taken back, it can never add energy.
+# The speed the pair is meant to part at and the friction impulse are kept on the contact, for relax.
+def separate(contact, d, restitution, friction, rebound, applied=0, approach=None):
+    contact.target = 0
+    contact.tangent = 0
     a = contact.a
     b = contact.b
-    n = contact.normal() # n^ = normal    
-    d = contact.overlap() # d = overlap
+    n = contact.normal() # n^ = normal
+    nx = n.x
+    ny = n.y
     p = contact.point() # Point of contact
+    ia = a.inv_mass
+    ib = b.inv_mass
+    ax, ay, avx, avy, aw = a.motion()
+    bx, by, bvx, bvy, bw = b.motion()
+
     # Resolve the overlap
-    # Resolve only if overlap > 0
-    if (d > 0):
-        m = 1/(1/a.mass + 1/b.mass)
-        # m = 1 / (1/ma + 1/mb)
-        contact.a.pos += (m/a.mass) * d * n
-        # translate a by (m/ma)*dn^ 
-        contact.b.pos += -(m/b.mass) * d * n
-        # translate b by -((m/ma)*dn^)
-
-        # Resolve velocity at the point of contact
-        # # VatContact
-        Va = a.vel
-        Sa = p - a.pos
-        Wa = a.avel
-        SaT = Vector2(-Sa.y, Sa.x)
-        # v - relative velocity 
-        VaContact = Va + Wa * SaT
-
-        Vb = b.vel
-        Sb = p - b.pos
-        Wb = b.avel
-        SbT = Vector2(-Sb.y, Sb.x)
-        VbContact = Vb + Wb * SbT
-
-        #resolve velocity
-        v = VaContact - VbContact
-
-        #vrebound = 1
-        vrebound = 300
-    
-        if(v.dot(n) < 0): # only resolve velocity if ->v * n^ < 0 (means objects are moving towards each other)
-            # relative velocity ->v = va - vb
-            j = m * (-v.dot(n) + vrebound)
-            # J = -(1 + E)m(->V*n^)
-            J = j * n
-            # ->J = Jn^
-            a.impulse(J) # a.impulse(->J)
-            b.impulse(-J) # b.impulse(->-J)
+    m = 1/(ia + ib)
+    # m = 1 / (1/ma + 1/mb)
+    if ia:
+        # translate a by (m/ma)*dn^
+        k = m * ia * d
+        ax += k * nx
+        ay += k * ny
+        a.set_position(ax, ay)
+    if ib:
+        # translate b by -((m/mb)*dn^)
+        k = -(m * ib) * d
+        bx += k * nx
+        by += k * ny
+        b.set_position(bx, by)
+
+    # Resolve velocity at the point of contact
+    # VaContact = Va + Wa * SaT, SaT = Sa rotated by 90 degrees = (-Sa.y, Sa.x), Sa = p - a.pos
+    sax = p.x - ax
+    say = p.y - ay
+    sbx = p.x - bx
+    sby = p.y - by
+    # v - relative velocity | VaContact - VbContact
+    vx = (avx - aw * say) - (bvx - bw * sby)
+    vy = (avy + aw * sax) - (bvy + bw * sbx)
+    vn = vx * nx + vy * ny
+
+    if approach is None:
+        approach = vn
+    # only resolve velocity if ->v * n^ < 0 (means objects are moving towards each other)
+    if vn >= 0 and not applied:
+        return 0
+    if rebound:
+        total = m * (-vn + rebound)
+    else:
+        # Part at E times the speed they met at, (->V*n^)target = -E(->V*n^)0, or 0 if they weren't meeting
+        # J = m((->V*n^)target - ->V*n^) on top of applied, which for a cold contact is -(1 + E)m(->V*n^)
+        contact.target = -restitution * approach if approach < 0 else 0
+        total = max(applied + m * (contact.target - vn), 0)
+    # What's left to apply after the warm start
+    j = total - applied
+    # ->J = Jn^ | a.impulse(->J), b.impulse(->-J)
+    jx = j * nx
+    jy = j * ny
+    if friction:
+        # Along the surface, t^ = n^ rotated by 90 degrees | Jt = -m(->V*t^), no more than friction * J either way
+        vt = vy * nx - vx * ny
+        jt = max(-friction * total, min(friction * total, -m * vt))
+        contact.tangent = jt
+        jx += jt * -ny
+        jy += jt * nx
+    if ia:
+        a.set_velocity(avx + jx * ia, avy + jy * ia)
+    if ib:
+        b.set_velocity(bvx + -jx * ib, bvy + -jy * ib)
+    return total
+
+# Speed the pair are coming together at along the normal, at the point of contact (negative if they are)
+def normal_speed(contact):
+    a = contact.a
+    b = contact.b
+    n = contact.normal()
+    p = contact.point()
+    ax, ay, avx, avy, aw = a.motion()
+    bx, by, bvx, bvy, bw = b.motion()
+    vx = (avx - aw * (p.y - ay)) - (bvx - bw * (p.y - by))
+    vy = (avy + aw * (p.x - ax)) - (bvy + bw * (p.x - bx))
+    return vx * n.x + vy * n.y
+
+# Another pass over a resting contact separate already did, after the others have moved its bodies:
+# J = m((->V*n^)target - ->V*n^), added to the impulse it has taken so far and kept >= 0, and friction the same
+# way, kept within friction times that. Nothing is moved, only velocities.
+def relax(contact, friction):
+    a = contact.a
+    b = contact.b
+    n = contact.normal()
+    nx = n.x
+    ny = n.y
+    p = contact.point()
+    ia = a.inv_mass
+    ib = b.inv_mass
+    ax, ay, avx, avy, aw = a.motion()
+    bx, by, bvx, bvy, bw = b.motion()
+    m = 1/(ia + ib)
+    sax = p.x - ax
+    say = p.y - ay
+    sbx = p.x - bx
+    sby = p.y - by
+    vx = (avx - aw * say) - (bvx - bw * sby)
+    vy = (avy + aw * sax) - (bvy + bw * sbx)
+    vn = vx * nx + vy * ny
+
+    total = max(contact.impulse + m * (contact.target - vn), 0)
+    j = total - contact.impulse
+    contact.impulse = total
+    jx = j * nx
+    jy = j * ny
+    if friction:
+        vt = vy * nx - vx * ny
+        tangent = max(-friction * total, min(friction * total, contact.tangent - m * vt))
+        jt = tangent - contact.tangent
+        contact.tangent = tangent
+        jx += jt * -ny
+        jy += jt * nx
+    if not jx and not jy:
+        return
+    if ia:
+        a.set_velocity(avx + jx * ia, avy + jy * ia)
+    if ib:
+        b.set_velocity(bvx + -jx * ib, bvy + -jy * ib)
 
     # E = restitution
     # m = reduced mass
-    # ->V = relative velocity    
-    
+    # ->V = relative velocity
+
     # NOTES ON RESOLVING ROTATIONAL CONTACT
     # VaContact = Va + (Wa x Sa) <- Cross product
     # Va = translational velocity | a.vel
@@ -119,57 +224,191 @@ def resolve_bumper_contact(contact, rebound_strength):
     # Sb = rc - rb
     # relative velocity V = Va control - Vb contact 
     # *Proceed as normal with resolve_contact()
-    return False
+
+# Keeps one contact per pair of bodies for as long as they stay close (their boxes overlap).
+# A kept contact is renewed instead of rebuilt, so it starts from what it found last step,
+# and the impulse it needed last step is applied up front (warm starting), so the passes of resolve_contacts
+# start from last step's answer. The warm start is only a first guess: they take back whatever of it the
+# contact doesn't need.
+class ContactManager:
+    def __init__(self, warm_start=0.8):
+        # Fraction of last step's impulse applied before resolving
+        self.warm_start_fraction = warm_start
+        self.contacts = {}
+        self.touched = set()
+        # Side of least overlap of every (ball, polygon) pair the batched kernel looked at last step, for it to
+        # try first this step (narrowphase.circle_polygon_contacts) | only a shortcut, so never saved
+        self.sides = {}
+        self.next_sides = {}
+
+    # Contact for a and b this step, renewed if the pair was already close last step
+    def get(self, a, b):
+        key = (id(a), id(b))
+        self.touched.add(key)
+        contact = self.contacts.get(key)
+        if contact is None:
+            contact = generate_contact(a, b)
+            contact.persisted = False
+            self.contacts[key] = contact
+        else:
+            contact.renew()
+            contact.persisted = True
+        return contact
+
+    # Same thing for a contact that was worked out somewhere else (the batched kernels)
+    def precomputed(self, a, b, overlap, normal, point):
+        key = (id(a), id(b))
+        self.touched.add(key)
+        contact = self.contacts.get(key)
+        if contact is None:
+            contact = Contact_Precomputed(a, b, overlap, normal, point)
+            contact.persisted = False
+            self.contacts[key] = contact
+        else:
+            contact.assign(overlap, normal, point)
+            contact.persisted = True
+        return contact
+
+    # Push a kept contact apart by most of what it needed last step | contact.impulse is then what was pushed,
+    # for separate to make up the rest of (or take some back)
+    def warm_start(self, contact):
+        j = self.warm_start_fraction * contact.impulse if contact.persisted else 0
+        contact.impulse = 0
+        if j > 0 and contact.overlap() > 0:
+            n = contact.normal()
+            jx = j * n.x
+            jy = j * n.y
+            a = contact.a
+            b = contact.b
+            ia = a.inv_mass
+            ib = b.inv_mass
+            if ia:
+                ax, ay, avx, avy, aw = a.motion()
+                a.set_velocity(avx + jx * ia, avy + jy * ia)
+            if ib:
+                bx, by, bvx, bvy, bw = b.motion()
+                b.set_velocity(bvx + -jx * ib, bvy + -jy * ib)
+            contact.impulse = j
+
+    # Last step's side for each (id(ball), id(polygon)) key, -1 for a pair that wasn't looked at
+    def side_hints(self, keys):
+        sides = self.sides
+        return [sides.get(key, -1) for key in keys]
+
+    def keep_sides(self, keys, sides):
+        self.next_sides.update(zip(keys, sides))
+
+    # Forget every pair that wasn't asked for this step
+    def end_step(self):
+        self.contacts = {key: contact for key, contact in self.contacts.items() if key in self.touched}
+        self.touched = set()
+        self.sides = self.next_sides
+        self.next_sides = {}
+
+    # Every kept contact as plain numbers, for saving (World.get_state). Only valid between steps.
+    # index maps id(body) -> the body's number in the list set_state will get
+    def get_state(self, index):
+        state = []
+        for (a, b), contact in self.contacts.items():
+            normal = contact.normal()
+            point = contact.point()
+            state.append([index[a], index[b], isinstance(contact, Contact_Precomputed), contact.impulse,
+                          contact.persisted, contact.overlap(), normal[0], normal[1], point[0], point[1],
+                          getattr(contact, "side", None)])
+        return state
+
+    # Put back contacts saved by get_state | bodies have to be where they were when it was saved
+    def set_state(self, state, bodies):
+        self.contacts = {}
+        self.touched = set()
+        self.sides = {}
+        self.next_sides = {}
+        for a, b, precomputed, impulse, persisted, overlap, nx, ny, px, py, side in state:
+            a = bodies[a]
+            b = bodies[b]
+            if precomputed:
+                contact = Contact_Precomputed(a, b, overlap, (nx, ny), (px, py))
+            else:
+                contact = generate_contact(a, b)
+                contact._overlap = overlap
+                contact._normal = Vector2(nx, ny)
+                contact._point = Vector2(px, py)
+                if side is not None:
+                    contact.side = side
+            contact.impulse = impulse
+            contact.persisted = persisted
+            self.contacts[(id(a), id(b))] = contact
 
 # Generic contact class, to be overridden by specific scenarios
+# renew() works out the overlap, normal and point once (per step) and keeps them.
+# overlap(), normal() and point() just hand back those results, so resolving, scoring and
+# sensors can all ask as often as they like without redoing the math.
 class Contact():
     def __init__(self, a, b):
         self.a = a
         self.b = b
+        # Total impulse resolve_contact pushed the pair apart with on the last step
+        self.impulse = 0
         self.renew()
- 
-    def renew(self):
-        pass
 
-    def overlap(self):  # virtual function
-        return 0                
+    def renew(self):  # virtual function
+        self._overlap = 0
+        self._normal = Vector2(0,0)
+        self._point = Vector2(0,0)
 
-    def normal(self):  # virtual function
-        return Vector2(0,0)
+    def overlap(self):
+        return self._overlap
+
+    def normal(self):
+        return self._normal
     
-    def point(self): # virtual function
-        return Vector2(0,0)
+    def point(self):
+        return self._point
 
 
+# A contact that was already worked out somewhere else (the batched kernels in narrowphase.py)
+# It just hands back the overlap, normal and point it was given, so resolve_contact can use it like any other
+class Contact_Precomputed(Contact):
+    def __init__(self, a, b, overlap, normal, point):
+        self.assign(overlap, normal, point)
+        super().__init__(a, b)
+
+    def assign(self, overlap, normal, point):
+        self._overlap = float(overlap)
+        self._normal = Vector2(normal[0], normal[1])
+        self._point = Vector2(point[0], point[1])
+
+    def renew(self):
+        pass
+
 # Contact class for two circles
 class Contact_Circle_Circle(Contact):
     def __init__(self, a, b):
         super().__init__(a, b)
 
-    def overlap(self):
-        return (self.a.radius + self.b.radius) - (self.a.pos - self.b.pos).magnitude() # Fill in the appropriate expression
-        # Return the calculated overlap
-
-    def normal(self):
-        return (self.a.pos - self.b.pos).normalize() # Fill in the appropriate expression
+    def renew(self):
+        r = self.a.pos - self.b.pos
+        distance = r.magnitude()
+        self._overlap = (self.a.radius + self.b.radius) - distance
         # vectors (ra - rb).normalize()
-        # return the calculated normal
+        self._normal = r / distance if distance > 0 else Vector2(0,0)
+        # Point on the surface of b, towards a
+        self._point = self.b.pos + self._normal * self.b.radius
 
 # Contact class for a circle and a wall
 class Contact_Circle_Wall(Contact):
     def __init__(self, a, b):
-        super().__init__(a, b)
         self.circle = a
         self.wall = b
+        super().__init__(a, b)
 
-    def overlap(self):          
-        return ((self.circle.radius) - (self.circle.pos - self.wall.pos).dot(self.wall.normal)) # Fill in the appropriate expression
-
-    def normal(self):
-        return self.wall.normal # Fill in the appropriate expression
+    def renew(self):
+        circle_pos = self.circle.pos
+        self._overlap = ((self.circle.radius) - (circle_pos - self.wall.pos).dot(self.wall.normal))
+        self._normal = self.wall.normal
+        self._point = circle_pos - self.wall.normal * self.circle.radius
         
 # Empty class for wall -> wall collisions. Since overlap() and normal() are not being overridden those should not be overlapped
-# Contact class for a circle and a wall
 class Contact_Wall_Wall(Contact):
     def __init__(self, a, b):
         super().__init__(a, b)
@@ -184,66 +423,63 @@ class Contact_Circle_Polygon(Contact):
     def renew(self):
         # Check overlap with each side
         # Check overlap with a vertex
-        # One option
         min_overlap = math.inf
         self.circle_overlaps_vertex = False
+        circle_pos = self.circle.pos
+        radius = self.circle.radius
+        points = self.polygon.points
+        normals = self.polygon.normals
 
-        for i in range(len(self.polygon.points)):
-            wall_pos = self.polygon.points[i]
-            wall_normal = self.polygon.normals[i]
+        # A contact kept from the last step (ContactManager) tries last step's side first.
+        # If the circle is fully outside that side's line it can't be touching the polygon at all
+        # (the real overlap is at most this one, side or vertex), so there's no need to look at the rest.
+        # Only true for a convex polygon with its normals pointing out (Polygon.convex), the rest always look.
+        side = getattr(self, "side", None)
+        if side is not None and self.polygon.convex:
+            overlap = radius - (circle_pos - points[side]).dot(normals[side])
+            if overlap < 0:
+                self.index = side
+                self._overlap = overlap
+                self._normal = normals[side]
+                self._point = circle_pos - normals[side] * radius
+                return
 
-        # Option 2, using zip (same as option 1)
-        for i, (wall_pos, wall_normal) \
-        in enumerate(zip(self.polygon.points, self.polygon.normals)):
-            overlap = ((self.circle.radius) - (self.circle.pos - wall_pos).dot(wall_normal)) # Fill in the appropriate expression
+        for i, (wall_pos, wall_normal) in enumerate(zip(points, normals)):
+            overlap = (radius - (circle_pos - wall_pos).dot(wall_normal))
             if overlap < min_overlap:
                 min_overlap = overlap
                 self.index = i # index of the side of least overlap
+        self.side = self.index
 
         ## Part 2 - Round off the endpoints
         # Check if the circle is beyond one of the two endpoints
-        point1 = self.polygon.points[self.index]
-        point2 = self.polygon.points[self.index - 1]
+        point1 = points[self.index]
+        point2 = points[self.index - 1]
 
         side = point1 - point2
-        if (self.circle.pos - point1).dot(side) > 0:
+        if (circle_pos - point1).dot(side) > 0:
             # We are beyond point 1
             self.circle_overlaps_vertex = True
             self.index = self.index # variable index set to the index of the vertex
-        elif (self.circle.pos - point2).dot(side) < 0:
+        elif (circle_pos - point2).dot(side) < 0:
             self.circle_overlaps_vertex = True
             self.index = self.index - 1 # variable index set to the index of the vertex
 
-    def overlap(self):          
         if self.circle_overlaps_vertex:
-            #Circle overlaps a vertex
-            # return the overlap for two circles where the radius of the vertex is zero
-            return ((self.circle.radius) - ((self.circle.pos - self.polygon.points[self.index]).magnitude()))
-                    
+            # Circle overlaps a vertex
+            # the overlap, normal and point for two circles where the radius of the vertex is zero
+            vertex = points[self.index]
+            offset = circle_pos - vertex
+            distance = offset.magnitude()
+            self._overlap = radius - distance
+            self._normal = offset / distance if distance > 0 else normals[self.index]
+            self._point = vertex
         else:
             # Circle overlaps a side
-            wall_pos = self.polygon.points[self.index]
-            wall_normal = self.polygon.normals[self.index]
-            return ((self.circle.radius) - (self.circle.pos - wall_pos).dot(wall_normal)) # Fill in the appropriate expression
+            self._overlap = min_overlap
+            self._normal = normals[self.index]
+            self._point = circle_pos - normals[self.index] * radius
 
-    def normal(self):
-        if self.circle_overlaps_vertex:
-            # Circle overlaps vertex
-            # just like the normal for two circles
-            # a circle - circle ||| b circle is the vertex
-            # COPY THE CODE FROM CIRCLE-CIRCLE COLLISION DETECTION
-            return (self.circle.pos - self.polygon.points[self.index]).normalize()
-        else:
-            # Circle overlaps side
-            return self.polygon.normals[self.index]# Fill in the appropriate expression
-    
-    def point(self):
-        if self.circle_overlaps_vertex:
-            return self.polygon.points[self.index]
-        else:
-            normal_offset = self.polygon.normals[self.index] * -1 * self.circle.radius
-            return self.circle.pos + normal_offset
-        
         # NOTES ON RESOLVING ROTATIONAL CONTACT
             # VaContact = Va + (Wa x Sa) <- Cross product
             # Va = translational velocity | a.vel
@@ -255,4 +491,13 @@ class Contact_Circle_Polygon(Contact):
             # Sb = rc - rb
             # relative velocity V = Va control - Vb contact 
             # *Proceed as normal with resolve_contact()
-            # .
\ No newline at end of file
+            # .
+
+# Pair dispatch table, built once at import
+# The contact classes are named in alphabetical order (Contact_Circle_Wall), so the lower type goes first.
+contact_table = {}
+for contact_class in (Contact_Circle_Circle, Contact_Circle_Wall, Contact_Wall_Wall, Contact_Circle_Polygon):
+    _, first, second = contact_class.__name__.split("_")
+    contact_table[(first, second)] = (contact_class, False)
+    if first != second:
+        contact_table[(second, first)] = (contact_class, True)
@@ -0,0 +1,464 @@
+import time
+import argparse
+import numpy as np
+from world import (World, height, plunger_y_max, plunger_y_min, tuning_dt, flipper_angle, flipper_max_angle,
+                   contact_margin)
+from narrowphase import EdgeBuffer, circle_polygon_contacts
+from table import default_table, convert_degree
+
+# Lots of independent games on the same table, stepped together.
+#
+# Every game (a "world" here) has the same static table, so that is taken once from an ordinary World and
+# shared. Everything that differs between games is an array with the world as its first axis: the balls are
+# (W, N, 2) positions and velocities (N = most balls a game can have), the flippers and plunger are one pose
+# per world, and score, timers and pads are one entry per world. Each phase of World.step then runs once for
+# all of them, with the contacts found by the batched kernel in narrowphase.py.
+#
+# It plays by the same rules as World.step (controls, wall/bumper/pad/teleporter scoring, multiball, drains),
+# but contacts are resolved straight from what was found at the start of the step, without warm starting,
+# swept (ccd) collision or sleeping. So single games come out close to World's but not bit for bit, which is
+# fine for the statistics this is for (score and drain time over thousands of launches).
+#
+#   python ensemble.py --worlds 2000 --seconds 30    random plunger pulls, prints the spread of the results
+
+# Ball indexes (rows of the flattened (W*N, 2) arrays) with the world each is in
+def world_of(rows, balls_per_world):
+    return rows // balls_per_world
+
+# (xmin, ymin, xmax, ymax) of every polygon packed in an EdgeBuffer-like object
+def polygon_boxes(edges):
+    if len(edges.count) == 0:
+        return np.zeros((0, 4))
+    lo = np.minimum.reduceat(edges.points, edges.start)
+    hi = np.maximum.reduceat(edges.points, edges.start)
+    return np.hstack((lo, hi))
+
+# One polygon (a flipper, the plunger) posed differently in every world, laid out like an EdgeBuffer
+# so circle_polygon_contacts can take it | polygon w is world w's copy
+class PosedPolygons:
+    def __init__(self, polygon, worlds):
+        self.offsets = np.array([(v.x, v.y) for v in polygon.offsets])
+        self.local_normals = np.array([(v.x, v.y) for v in polygon.local_normals])
+        self.pivot = np.array([polygon.pos.x, polygon.pos.y])
+        self.material = polygon.material
+        sides = len(self.offsets)
+        self.polygons = range(worlds)
+        self.count = np.full(worlds, sides, dtype=np.intp)
+        self.start = np.arange(worlds, dtype=np.intp) * sides
+        local = np.arange(worlds * sides) % sides
+        self.prev = np.where(local == 0, np.arange(worlds * sides) + sides - 1, np.arange(worlds * sides) - 1)
+        self.points = np.zeros((worlds * sides, 2))
+        self.normals = np.zeros((worlds * sides, 2))
+        self.boxes = np.zeros((worlds, 4))
+
+    # Same as Polygon.update_points, for every world at once | pivot is (W, 2) or one point, angle is (W,)
+    def pose(self, pivot, angle):
+        c = np.cos(angle)[:, None]
+        s = np.sin(angle)[:, None]
+        ox = self.offsets[:, 0]
+        oy = self.offsets[:, 1]
+        nx = self.local_normals[:, 0]
+        ny = self.local_normals[:, 1]
+        pivot = np.broadcast_to(pivot, (len(angle), 2))
+        points = np.stack((pivot[:, 0:1] + c * ox - s * oy, pivot[:, 1:2] + s * ox + c * oy), axis=2)
+        self.points[:] = points.reshape(-1, 2)
+        self.normals[:] = np.stack((c * nx - s * ny, s * nx + c * ny), axis=2).reshape(-1, 2)
+        self.boxes[:] = np.hstack((points.min(axis=1), points.max(axis=1)))
+
+class Ensemble:
+    def __init__(self, worlds, table=default_table, max_balls=2, params=None):
+        # An ordinary World supplies the table: geometry, materials, tuning and where the balls go
+        template = World(table, params)
+        self.template = template
+        self.worlds = worlds
+        self.max_balls = max_balls
+        self.radius = template.ball_radius
+        self.gravity = np.array([template.gravity.acc.x, template.gravity.acc.y])
+        # Every contact is with a ball, so the ball's row of the material pairs is all that is needed |
+        # (restitution, friction, rebound speed, score) against each material, indexed by the other shape's
+        materials = template.materials
+        self.pairs = np.array(materials.pairs[template.ball_material], dtype=float).reshape(-1, 4)
+        self.ball_restitution = materials.pairs[template.ball_material][template.ball_material][0]
+        self.plunger_accel = template.plunger_accel
+        self.flipper_ang_accel = template.flipper_ang_accel
+        self.flipper_ang_decel = template.flipper_ang_decel
+        self.reset_pos = np.array([template.ball_reset_pos.x, template.ball_reset_pos.y])
+        self.multiball_pos = np.array([template.multiball_pos.x, template.multiball_pos.y])
+
+        ## Shared table
+        self.wall_edges = template.wall_edges
+        self.wall_boxes = polygon_boxes(self.wall_edges)
+        # Infinite walls | always tested, like in the BVH
+        planes = [wall for wall in template.walls if wall.contact_type == "Wall"]
+        self.plane_points = np.array([(wall.pos.x, wall.pos.y) for wall in planes]).reshape(-1, 2)
+        self.plane_normals = np.array([(wall.normal.x, wall.normal.y) for wall in planes]).reshape(-1, 2)
+        self.plane_materials = np.array([wall.material for wall in planes], dtype=np.intp)
+        self.wall_materials = np.array([polygon.material for polygon in self.wall_edges.polygons], dtype=np.intp)
+        self.bumper_edges = template.bumper_edges
+        self.bumper_boxes = polygon_boxes(self.bumper_edges)
+        circles = [obj for obj in template.bumpers if obj.contact_type == "Circle"]
+        self.bumper_centers = np.array([(obj.pos.x, obj.pos.y) for obj in circles]).reshape(-1, 2)
+        self.bumper_radii = np.array([obj.radius for obj in circles])
+        self.bumper_materials = np.array([polygon.material for polygon in self.bumper_edges.polygons], dtype=np.intp)
+        self.bumper_circle_materials = np.array([obj.material for obj in circles], dtype=np.intp)
+
+        # Score pads | pad_polygons/pad_circles hold each pad's column in lit
+        zones = template.bonus_zones
+        self.pad_polygons = [i for i, obj in enumerate(zones) if obj.contact_type == "Polygon"]
+        self.pad_circles = [i for i, obj in enumerate(zones) if obj.contact_type == "Circle"]
+        self.pad_edges = EdgeBuffer([zones[i] for i in self.pad_polygons])
+        self.pad_boxes = polygon_boxes(self.pad_edges)
+        self.pad_centers = np.array([(zones[i].pos.x, zones[i].pos.y) for i in self.pad_circles]).reshape(-1, 2)
+        self.pad_radii = np.array([zones[i].radius for i in self.pad_circles])
+        # What each pad scores and how long it stays off after
+        self.pad_score = np.array([materials.of(obj).score for obj in zones], dtype=np.int64)
+        self.pad_cooldown_time = np.array([pad.cooldown for pad in template.pads], dtype=float)
+
+        entrance = template.save_ball_tele_entr
+        self.teleporter_entrance = np.array([entrance.pos.x, entrance.pos.y])
+        self.teleporter_radius = entrance.radius
+        self.teleporter_exit = np.array([template.save_ball_tele_exit.pos.x, template.save_ball_tele_exit.pos.y])
+
+        ## Moving walls | [left, right] for the flippers
+        self.flippers = [PosedPolygons(template.left_flipper, worlds), PosedPolygons(template.right_flipper, worlds)]
+        # Which way pressing the button turns each flipper, where it rests and how far it goes
+        self.flipper_press = np.array([-1.0, 1.0])
+        self.flipper_rest = np.array([convert_degree(flipper_angle), convert_degree(-flipper_angle)])
+        self.flipper_limit = np.array([convert_degree(-flipper_max_angle), convert_degree(flipper_max_angle)])
+        self.plunger = PosedPolygons(template.plunger, worlds)
+        self.plunger_x = template.plunger.pos.x
+        self.reset()
+
+    # Every world back to the start of a game
+    def reset(self):
+        W = self.worlds
+        N = self.max_balls
+        template = self.template
+        self.pos = np.zeros((W, N, 2))
+        self.vel = np.zeros((W, N, 2))
+        # on_table is every ball a game has (World.balls), active the ones being stepped | a second ball that
+        # has fallen out is left off until the first ball drains and puts it back
+        self.on_table = np.zeros((W, N), dtype=bool)
+        self.pos[:, 0] = (template.ball_in_play.pos.x, template.ball_in_play.pos.y)
+        self.on_table[:, 0] = True
+        self.active = self.on_table.copy()
+
+        self.flipper_angle = np.tile([template.left_flipper.angle, template.right_flipper.angle], (W, 1))
+        self.flipper_avel = np.zeros((W, 2))
+        self.plunger_y = np.full(W, template.plunger.pos.y)
+        self.plunger_vel = np.zeros(W)
+
+        self.time = np.zeros(W)
+        self.score = np.zeros(W, dtype=np.int64)
+        self.balls_left = np.full(W, template.balls_left)
+        self.alive = np.ones(W, dtype=bool)
+        self.no_bonus_ball = np.ones(W, dtype=bool)
+        # Seconds until each pad comes back on (0 while it is lit), and which pads each ball is on
+        self.pad_cooldown = np.zeros((W, len(template.bonus_zones)))
+        self.lit = np.ones((W, len(template.bonus_zones)), dtype=bool)
+        self.on_pad = np.zeros((W * N, len(template.bonus_zones)), dtype=bool)
+        self.teleporter_ready = np.ones(W, dtype=bool)
+
+        # What happened in each world
+        self.drain_time = np.full(W, np.nan)
+        self.game_over_time = np.full(W, np.nan)
+        self.events = {name: np.zeros(W, dtype=np.int64) for name in
+                       ("bumper_hits", "pad_hits", "flipper_hits", "teleports", "multiballs", "drains")}
+
+    # Start every world's first ball from its own place and speed | (W, 2) arrays or one (x, y) for all
+    def launch(self, pos=None, vel=None):
+        if pos is not None:
+            self.pos[:, 0] = pos
+        if vel is not None:
+            self.vel[:, 0] = vel
+
+    ## Contacts
+    # Every ball row against the polygons in edges whose boxes it touches
+    # Returns (rows, normal, overlap, point, polygon) of the pairs that were tested
+    def polygon_contacts(self, rows, edges, boxes, pair_world=False):
+        r = self.radius + contact_margin
+        centers = self.pos.reshape(-1, 2)[rows]
+        if pair_world:
+            # One polygon per world (the flippers and plunger), each ball only meets its own world's
+            candidates = world_of(rows, self.max_balls)
+            box = boxes[candidates]
+            near = ((box[:, 0] <= centers[:, 0] + r) & (centers[:, 0] - r <= box[:, 2]) &
+                    (box[:, 1] <= centers[:, 1] + r) & (centers[:, 1] - r <= box[:, 3]))
+            pair_ball = np.flatnonzero(near)
+            pair_poly = candidates[pair_ball]
+        else:
+            near = ((boxes[None, :, 0] <= centers[:, None, 0] + r) & (centers[:, None, 0] - r <= boxes[None, :, 2]) &
+                    (boxes[None, :, 1] <= centers[:, None, 1] + r) & (centers[:, None, 1] - r <= boxes[None, :, 3]))
+            pair_ball, pair_poly = np.nonzero(near)
+        found = circle_polygon_contacts(centers, self.radius, edges, pair_ball, pair_poly)
+        return rows[found.ball], found.normal, found.overlap, found.point, found.polygon
+
+    # Every ball row against circles | normal points from the circle to the ball
+    def circle_contacts(self, rows, centers, radii):
+        if len(centers) == 0 or len(rows) == 0:
+            return rows[:0], np.zeros((0, 2)), np.zeros(0), np.zeros(0, dtype=np.intp)
+        offset = self.pos.reshape(-1, 2)[rows][:, None, :] - centers[None, :, :]
+        distance = np.sqrt((offset ** 2).sum(axis=2))
+        overlap = (radii[None, :] + self.radius) - distance
+        ball, circle = np.nonzero(overlap > -contact_margin)
+        d = distance[ball, circle]
+        normal = np.zeros((len(ball), 2))
+        safe = d > 0
+        normal[safe] = offset[ball, circle][safe] / d[safe, None]
+        return rows[ball], normal, overlap[ball, circle], circle
+
+    # Push balls out of what they hit and bounce them, one contact per ball at a time in the order given,
+    # so a ball touching two things is resolved the way World does it (one after the other)
+    # body_vel is the velocity of the thing hit at the contact point, pair its row of self.pairs (by the
+    # material of the thing hit). Returns the balls' rows that were moving into what they hit
+    def resolve(self, rows, normal, overlap, body_vel, pair):
+        touching = overlap > 0
+        order = np.flatnonzero(touching)[np.argsort(rows[touching], kind="stable")]
+        rows = rows[order]
+        normal = normal[order]
+        overlap = overlap[order]
+        body_vel = body_vel[order]
+        restitution, friction, rebound = pair[order, 0], pair[order, 1], pair[order, 2]
+        if len(rows) == 0:
+            return rows
+        # Which of its contacts (0, 1, 2, ...) each one is for its ball
+        first = np.r_[True, rows[1:] != rows[:-1]]
+        rank = np.arange(len(rows)) - np.maximum.accumulate(np.where(first, np.arange(len(rows)), 0))
+
+        pos = self.pos.reshape(-1, 2)
+        vel = self.vel.reshape(-1, 2)
+        hit = []
+        for k in range(rank.max() + 1):
+            now = rank == k
+            b = rows[now]
+            n = normal[now]
+            pos[b] += overlap[now, None] * n
+            v = vel[b] - body_vel[now]
+            vn = np.einsum("ij,ij->i", v, n)
+            moving_in = vn < 0
+            j = np.where(rebound[now] > 0, -vn + rebound[now], -(1 + restitution[now]) * vn)
+            # Friction along t^ = n^ turned 90 degrees, at most friction * j either way (see contact.separate)
+            limit = friction[now] * j
+            jt = np.clip(v[:, 0] * n[:, 1] - v[:, 1] * n[:, 0], -limit, limit)
+            dv = j[:, None] * n + jt[:, None] * np.stack((-n[:, 1], n[:, 0]), axis=1)
+            vel[b[moving_in]] += dv[moving_in]
+            hit.append(b[moving_in])
+        return np.concatenate(hit)
+
+    ## Step
+    # Same as World.apply_inputs, for every world
+    def apply_inputs(self, dt, plunger, left_flipper, right_flipper):
+        rate = dt / tuning_dt
+        y = self.plunger_y
+        v = self.plunger_vel
+        self.plunger_vel = np.where(plunger, np.where(y < plunger_y_min, 150.0, 0.0),
+                                    np.where(y > plunger_y_max, v - self.plunger_accel * rate,
+                                             np.where(np.abs(v) >= 1e-6, 0.0, v)))
+
+        low = np.minimum(self.flipper_rest, self.flipper_limit)
+        high = np.maximum(self.flipper_rest, self.flipper_limit)
+        angle = np.clip(self.flipper_angle, low, high)
+        self.flipper_angle = angle
+        pressed = np.stack((left_flipper, right_flipper), axis=1)
+        press = self.flipper_press
+        can_swing = (angle - self.flipper_limit) * press < 0
+        can_return = (angle - self.flipper_rest) * -press < 0
+        avel = self.flipper_avel
+        self.flipper_avel = np.where(pressed, np.where(can_swing, avel + press * self.flipper_ang_accel * rate, 0.0),
+                                     np.where(can_return, avel - press * self.flipper_ang_decel * rate, 0.0))
+
+    # Advance every world that is still playing by dt | the buttons are one bool for every world or (W,) arrays
+    def step(self, dt, plunger=False, left_flipper=False, right_flipper=False):
+        W = self.worlds
+        N = self.max_balls
+        alive = self.alive
+        plunger = np.broadcast_to(np.asarray(plunger, dtype=bool), (W,))
+        left_flipper = np.broadcast_to(np.asarray(left_flipper, dtype=bool), (W,))
+        right_flipper = np.broadcast_to(np.asarray(right_flipper, dtype=bool), (W,))
+        self.apply_inputs(dt, plunger, left_flipper, right_flipper)
+        for flipper, side in zip(self.flippers, (0, 1)):
+            flipper.pose(flipper.pivot, self.flipper_angle[:, side])
+        self.plunger.pose(np.stack((np.full(W, self.plunger_x), self.plunger_y), axis=1), np.zeros(W))
+
+        rows = np.flatnonzero((self.active & alive[:, None]).ravel())
+        pos = self.pos.reshape(-1, 2)
+
+        ## Walls, flippers, plunger and bumpers | found first, then resolved together in one pass, each contact
+        ## by its material (like World's resolve_contacts)
+        # (rows, normal, overlap, body velocity, material of the thing hit) for each kind of thing
+        found = []
+        ball, normal, overlap, point, polygon = self.polygon_contacts(rows, self.wall_edges, self.wall_boxes)
+        found.append((ball, normal, overlap, np.zeros((len(ball), 2)), self.wall_materials[polygon]))
+        if len(self.plane_points):
+            centers = pos[rows]
+            overlap = self.radius - np.einsum("ijk,jk->ij", centers[:, None, :] - self.plane_points[None], self.plane_normals)
+            ball, plane = np.nonzero(overlap > -contact_margin)
+            found.append((rows[ball], self.plane_normals[plane], overlap[ball, plane], np.zeros((len(ball), 2)),
+                          self.plane_materials[plane]))
+        flipper_rows = []
+        for flipper, side in zip(self.flippers, (0, 1)):
+            ball, normal, overlap, point, world = self.polygon_contacts(rows, flipper, flipper.boxes, pair_world=True)
+            # Velocity of the flipper where it touches | avel x (point - pivot)
+            s = point - flipper.pivot
+            body_vel = self.flipper_avel[world, side][:, None] * np.stack((-s[:, 1], s[:, 0]), axis=1)
+            found.append((ball, normal, overlap, body_vel, np.full(len(ball), flipper.material)))
+            flipper_rows.append(ball[overlap > 0])
+        ball, normal, overlap, point, world = self.polygon_contacts(rows, self.plunger, self.plunger.boxes, pair_world=True)
+        found.append((ball, normal, overlap, np.stack((np.zeros(len(world)), self.plunger_vel[world]), axis=1),
+                      np.full(len(ball), self.plunger.material)))
+        ball, normal, overlap, point, polygon = self.polygon_contacts(rows, self.bumper_edges, self.bumper_boxes)
+        found.append((ball, normal, overlap, np.zeros((len(ball), 2)), self.bumper_materials[polygon]))
+        bumpers = ball[overlap >= 0]
+        ball, normal, overlap, circle = self.circle_contacts(rows, self.bumper_centers, self.bumper_radii)
+        found.append((ball, normal, overlap, np.zeros((len(ball), 2)), self.bumper_circle_materials[circle]))
+        bumpers = np.concatenate((bumpers, ball[overlap >= 0]))
+
+        ball, normal, overlap, body_vel, material = (np.concatenate(parts) for parts in zip(*found))
+        pair = self.pairs[material]
+        # Every step a ball touches something with a score scores, like World
+        touching = overlap >= 0
+        np.add.at(self.score, world_of(ball[touching], N), pair[touching, 3].astype(np.int64))
+        self.resolve(ball, normal, overlap, body_vel, pair)
+        flipper_rows = np.concatenate(flipper_rows)
+        np.add.at(self.events["flipper_hits"], world_of(flipper_rows, N), 1)
+        np.add.at(self.events["bumper_hits"], world_of(bumpers, N), 1)
+
+        ## Pads | a lit pad scores when a ball comes onto it, then stays off for its cooldown, like World's sensors
+        cooling = ~self.lit & alive[:, None]
+        self.pad_cooldown[cooling] -= dt
+        relit = cooling & (self.pad_cooldown <= 0)
+        self.lit |= relit
+        self.pad_cooldown[relit] = 0
+        on_pad = np.zeros_like(self.on_pad)
+        ball, normal, overlap, point, pad = self.polygon_contacts(rows, self.pad_edges, self.pad_boxes)
+        on = overlap > 2
+        on_pad[ball[on], np.array(self.pad_polygons, dtype=np.intp)[pad[on]]] = True
+        ball, normal, overlap, pad = self.circle_contacts(rows, self.pad_centers, self.pad_radii)
+        on = overlap > 2
+        on_pad[ball[on], np.array(self.pad_circles, dtype=np.intp)[pad[on]]] = True
+        entered = (on_pad & ~self.on_pad).reshape(W, N, -1).any(axis=1)
+        self.on_pad = on_pad
+        hits = entered & self.lit
+        self.score += (hits * self.pad_score).sum(axis=1)
+        self.events["pad_hits"] += hits.sum(axis=1)
+        self.lit &= ~hits
+        self.pad_cooldown[hits] = np.broadcast_to(self.pad_cooldown_time, hits.shape)[hits]
+
+        ## Teleporter | first ball only
+        first = pos[0::N]
+        offset = first - self.teleporter_entrance
+        overlap = (self.teleporter_radius + self.radius) - np.sqrt((offset ** 2).sum(axis=1))
+        teleport = alive & (overlap > 2) & (self.score >= 1000) & self.teleporter_ready
+        self.pos[teleport, 0] = self.teleporter_exit
+        self.vel[teleport, 0, 1] = 0
+        self.teleporter_ready &= ~teleport
+        self.events["teleports"] += teleport
+
+        ## Multiball
+        if N > 1:
+            extra = alive & (self.score > 300) & self.no_bonus_ball
+            self.pos[extra, 1] = self.multiball_pos
+            self.vel[extra, 1] = 0
+            self.on_table[extra, 1] = True
+            self.active[extra, 1] = True
+            self.no_bonus_ball &= ~extra
+            self.events["multiballs"] += extra
+
+        ## Balls on balls | each pair of slots across every world at once
+        for i in range(N):
+            for j in range(i + 1, N):
+                both = self.active[:, i] & self.active[:, j] & alive
+                r = self.pos[:, i] - self.pos[:, j]
+                distance = np.sqrt((r ** 2).sum(axis=1))
+                overlap = 2 * self.radius - distance
+                hit = both & (overlap > 0) & (distance > 0)
+                n = r[hit] / distance[hit, None]
+                d = overlap[hit, None]
+                self.pos[hit, i] += 0.5 * d * n
+                self.pos[hit, j] -= 0.5 * d * n
+                vn = np.einsum("ij,ij->i", self.vel[hit, i] - self.vel[hit, j], n)
+                jn = np.where(vn < 0, -(1 + self.ball_restitution) * 0.5 * vn, 0.0)[:, None] * n
+                self.vel[hit, i] += jn
+                self.vel[hit, j] -= jn
+
+        ## Integrate
+        moving = self.active & alive[:, None]
+        self.vel[moving] += self.gravity * dt
+        self.pos[moving] += self.vel[moving] * dt
+        self.plunger_y = np.where(alive, self.plunger_y + self.plunger_vel * dt, self.plunger_y)
+        self.flipper_angle = np.where(alive[:, None], self.flipper_angle + self.flipper_avel * dt, self.flipper_angle)
+        self.time[alive] += dt
+
+        # A second ball that has fallen out can't hit anything until it is put back (drains, below), so it
+        # stops being stepped | World lets it keep falling, which comes to the same thing
+        self.active[:, 1:] &= self.pos[:, 1:, 1] <= height + 100
+
+        ## Drains | only the first ball counts, like World
+        drained = alive & (self.pos[:, 0, 1] > height)
+        if drained.any():
+            self.balls_left -= drained
+            self.events["drains"] += drained
+            first_drain = drained & np.isnan(self.drain_time)
+            self.drain_time[first_drain] = self.time[first_drain]
+            again = drained & (self.balls_left >= 0)
+            # World puts every ball back on the plunger, fallen out or not
+            self.pos[again] = self.reset_pos
+            self.vel[again] = 0
+            self.active[again] = self.on_table[again]
+            self.teleporter_ready |= again
+            over = drained & (self.balls_left < 0)
+            self.game_over_time[over] = self.time[over]
+            self.pos[over] = 0
+            self.vel[over] = 0
+            self.alive &= ~over
+
+    # Step until every game is over or seconds have gone by | inputs(ensemble) gives the buttons each step
+    def run(self, seconds, dt=1/240, inputs=None):
+        for _ in range(int(round(seconds / dt))):
+            if not self.alive.any():
+                break
+            buttons = inputs(self) if inputs is not None else (False, False, False)
+            self.step(dt, *buttons)
+        return self.results()
+
+    # Per-world results | drain_time and game_over_time are nan for worlds where it didn't happen
+    def results(self):
+        results = {"score": self.score.copy(), "time": self.time.copy(), "balls_left": self.balls_left.copy(),
+                   "drain_time": self.drain_time.copy(), "game_over_time": self.game_over_time.copy()}
+        for name, counts in self.events.items():
+            results[name] = counts.copy()
+        return results
+
+# Hold the plunger for a different time in each world, then let go | the flippers stay down
+def plunger_pulls(hold):
+    def inputs(ensemble):
+        return (ensemble.time < hold, False, False)
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Step many games on one table together")
+    parser.add_argument("--worlds", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=30, help="game time to simulate")
+    parser.add_argument("--rate", type=int, default=240, help="physics steps per second")
+    parser.add_argument("--table", default=default_table)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    ensemble = Ensemble(args.worlds, args.table)
+    hold = rng.uniform(0.5, 2.5, args.worlds)
+    start = time.perf_counter()
+    results = ensemble.run(args.seconds, 1 / args.rate, plunger_pulls(hold))
+    seconds = time.perf_counter() - start
+
+    score = results["score"]
+    drained = ~np.isnan(results["drain_time"])
+    print(f"{args.worlds} worlds, {args.seconds:.0f} s of play each in {seconds:.2f} s")
+    print(f"score           mean {score.mean():.0f}  median {np.median(score):.0f}  max {score.max()}")
+    if drained.any():
+        print(f"first drain     {drained.mean():.0%} of worlds, median at {np.median(results['drain_time'][drained]):.1f} s")
+    for name in ensemble.events:
+        print(f"{name:15} mean {results[name].mean():.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
-import pygame
-from pygame.math import Vector2
+from vector import Vector2
 import itertools
 import math
+import numpy as np
 
 class SingleForce:
-    def __init__(self, objects_list=[]):
-        self.objects_list = objects_list
+    def __init__(self, objects_list=None):
+        self.objects_list = objects_list if objects_list is not None else []
 
     def apply(self):
         for obj in self.objects_list:
@@ -17,30 +17,84 @@ class SingleForce:
 
 
 class PairForce:
-    def __init__(self, objects_list=[]):
-        self.objects_list = objects_list
-
-    def apply(self):        
-        # Loop over all pairs of objects and apply the calculated force
-        for object in self.objects_list:
-            for i in self.objects_list:
-                force = self.force(i, object)
-                (i).add_force(force)
-                object.add_force(-force)
-
-        # to each object, respecting Newton's 3rd Law.  
-        # Use either two nested for loops (taking care to do each pair once)
-        # or use the itertools library (specifically, the function combinations).
-        pass
+    def __init__(self, objects_list=None, cutoff=None, skin=0):
+        self.objects_list = objects_list if objects_list is not None else []
+        # With a cutoff, only pairs closer than cutoff get their force calculated.
+        # Close pairs are found with a grid of cells and kept in a neighbor (Verlet) list that covers
+        # cutoff + skin, so the list only has to be rebuilt once something has moved more than skin/2.
+        self.cutoff = cutoff
+        self.skin = skin
+        self.neighbors = []
+        self.built_positions = []
+
+    def apply(self):
+        # Each pair once, applied to both objects, respecting Newton's 3rd Law.
+        # The neighbor list reaches out to cutoff + skin, so the pairs in the skin are skipped here
+        limit = self.cutoff * self.cutoff if self.cutoff is not None else None
+        for a, b in self.pairs():
+            if limit is not None:
+                dx = a.pos.x - b.pos.x
+                dy = a.pos.y - b.pos.y
+                if dx * dx + dy * dy > limit:
+                    continue
+            force = self.force(a, b)
+            a.add_force(force)
+            b.add_force(-force)
+
+    # Every pair that needs its force calculated this step
+    def pairs(self):
+        if self.cutoff is None:
+            return itertools.combinations(self.objects_list, 2)
+        if self.needs_rebuild():
+            self.build_neighbors()
+        return self.neighbors
+
+    def needs_rebuild(self):
+        if len(self.built_positions) != len(self.objects_list):
+            return True
+        limit = (self.skin / 2) ** 2
+        for obj, (x, y) in zip(self.objects_list, self.built_positions):
+            pos = obj.pos
+            if (pos.x - x) ** 2 + (pos.y - y) ** 2 > limit:
+                return True
+        return False
+
+    def build_neighbors(self):
+        reach = self.cutoff + self.skin
+        positions = [(obj.pos.x, obj.pos.y) for obj in self.objects_list]
+
+        # Drop every object into a grid of cells as big as the reach
+        cells = {}
+        for i, (x, y) in enumerate(positions):
+            cells.setdefault((math.floor(x / reach), math.floor(y / reach)), []).append(i)
+
+        # Anything within reach is in the same cell or one of the 8 around it
+        self.neighbors = []
+        for (cx, cy), members in cells.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    others = cells.get((cx + dx, cy + dy))
+                    if others is None:
+                        continue
+                    for i in members:
+                        xi, yi = positions[i]
+                        for j in others:
+                            # j > i so each pair only goes in once
+                            if j <= i:
+                                continue
+                            xj, yj = positions[j]
+                            if (xi - xj) ** 2 + (yi - yj) ** 2 <= reach * reach:
+                                self.neighbors.append((self.objects_list[i], self.objects_list[j]))
+        self.built_positions = positions
 
     def force(self, a, b): # virtual function
         return Vector2(0, 0)
 
 
 class BondForce: # Bond the objects together in order
-    def __init__(self, pairs_list=[]):
+    def __init__(self, pairs_list=None):
         # pairs_list has the format [[obj1, obj2], [obj3, obj4], ... ]
-        self.pairs_list = pairs_list
+        self.pairs_list = pairs_list if pairs_list is not None else []
 
     def apply(self):
         # Loop over all pairs from the pairs list.  
@@ -72,37 +126,43 @@ class BondForce: # Bond the objects together in order
 
 # Add Gravity, SpringForce, SpringRepulsion, AirDrag
 class Gravity(SingleForce):
-    def __init__(self, acc=(0,0), **kwargs):
+    def __init__(self, acc=(0,0), system=None, **kwargs):
         self.acc = Vector2(acc)
+        # Everything in a ParticleSystem gets its gravity in one numpy operation
+        self.system = system
         super().__init__(**kwargs)
 
+    def apply(self):
+        if self.system is not None:
+            self.system.add_acceleration(self.acc)
+        super().apply()
+
     def force(self, obj): # overriding the super class
         if (obj.mass == math.inf):
-            return pygame.Vector2(0,0)
+            return Vector2(0,0)
         else:
             return obj.mass*self.acc
         # Note: this will throw an error if the object has infinite mass.
         # Think about how to handle those.
 
 class SpringForce(BondForce):
-    def __init__(self, pairs_list=[]):
+    def __init__(self, pairs_list=None, k=2.5, l=30, b=0.0002):
         # pairs_list has the format [[obj1, obj2], [obj3, obj4], ... ]
-        self.pairs_list = pairs_list
-
-    def force(self, objA, objB):        
-        k=2.5
-        l=30
-        # b=0.0002
-        b=.0002
-        zeroV = Vector2(0,0)
-        if(objA.pos - objB.pos == zeroV):
-            return zeroV
-            
-        r = Vector2(objA.pos - objB.pos)
-        v = Vector2(objA.vel - objB.vel)
+        self.pairs_list = pairs_list if pairs_list is not None else []
+        # k = spring stiffness | l = natural length | b = dampening constant
+        self.k = k
+        self.l = l
+        self.b = b
+
+    def force(self, objA, objB):
+        r = objA.pos - objB.pos
+        length = r.magnitude()
+        if length == 0:
+            return Vector2(0,0)
 
-        # v = Vector2(objA.vel - objB.vel)
-        Fspring = (-k * (r.magnitude() - l) - (b * v).dot(r.normalize())) * r.normalize()
+        v = objA.vel - objB.vel
+        r_hat = r / length
+        Fspring = (-self.k * (length - self.l) - self.b * v.dot(r_hat)) * r_hat
         return Fspring
 
         # Spring force 
@@ -111,12 +171,82 @@ class SpringForce(BondForce):
         # Fspring = [-k(|r| - l)-bv * ^r] ^r
         # r = ra - rb | v = va - vb
         # keep dampening at 0 until stiffness/length are good
-        # k = spring stiffness | l = natural length | b = dampening constant
 
     # Allow drawing of the lines
     def draw(self, window):
+        from renderer import draw_line
         for a,b in self.pairs_list: # unpacking the two-element list
-            pygame.draw.line(window, [225, 225, 0], a.pos, b.pos)
+            draw_line(window, [225, 225, 0], a.pos, b.pos)
+
+# Lots of springs at once, for slingshots, soft bumpers and chains.
+# Every object has to be in the same ParticleSystem. Bonds are stored as index arrays into it, with their
+# own stiffness, natural length and dampening, and all of them are evaluated in one numpy pass.
+class SpringNetwork:
+    def __init__(self, system, pairs_list=(), k=2.5, l=30, b=0.0002, color=[225, 225, 0]):
+        # pairs_list has the format [[obj1, obj2], [obj3, obj4], ... ]
+        # k, l and b can be one number for every bond or one per bond. l=None uses each bond's current length.
+        self.system = system
+        self.color = color
+        self.a = np.array([a.index for a, b in pairs_list], dtype=np.intp)
+        self.b = np.array([b.index for a, b in pairs_list], dtype=np.intp)
+        for pair in pairs_list:
+            for obj in pair:
+                if obj.system is not system:
+                    raise ValueError("every object in a SpringNetwork has to be in its ParticleSystem")
+
+        count = len(self.a)
+        self.k = np.broadcast_to(np.asarray(k, dtype=float), (count,)).copy()
+        self.damping = np.broadcast_to(np.asarray(b, dtype=float), (count,)).copy()
+        if l is None:
+            self.l = np.sqrt(((system.pos[self.a] - system.pos[self.b]) ** 2).sum(axis=1))
+        else:
+            self.l = np.broadcast_to(np.asarray(l, dtype=float), (count,)).copy()
+        system.networks.append(self)
+        self.find_chains()
+
+    # Bonds that follow on from each other (one's b is the next one's a) are drawn as one line through all of
+    # their rows | chains is a list of row arrays, a lone bond being a chain of two
+    def find_chains(self):
+        breaks = np.flatnonzero(self.a[1:] != self.b[:-1]) + 1
+        self.chains = [np.concatenate((self.a[run[:1]], self.b[run]))
+                       for run in np.split(np.arange(len(self.a)), breaks) if len(run)]
+
+    # Whether any bond holds row i
+    def uses(self, i):
+        return bool((self.a == i).any() or (self.b == i).any())
+
+    # The particle in row old is now in row new (ParticleSystem.remove)
+    def moved(self, old, new):
+        self.a[self.a == old] = new
+        self.b[self.b == old] = new
+        self.find_chains()
+
+    # Same formula as SpringForce.force, for every bond at once
+    def apply(self):
+        pos = self.system.pos
+        vel = self.system.vel
+        r = pos[self.a] - pos[self.b]
+        v = vel[self.a] - vel[self.b]
+        length = np.sqrt(np.einsum("ij,ij->i", r, r))
+
+        # Bonds squashed down to nothing push with no direction, so they get no force (like SpringForce)
+        r_hat = np.zeros_like(r)
+        stretched = length > 0
+        r_hat[stretched] = r[stretched] / length[stretched, None]
+
+        magnitude = -self.k * (length - self.l) - self.damping * np.einsum("ij,ij->i", v, r_hat)
+        force = magnitude[:, None] * r_hat
+        # add.at so an object in several bonds gets all of them
+        np.add.at(self.system.force, self.a, force)
+        np.add.at(self.system.force, self.b, -force)
+
+    # One polyline per chain (see find_chains) | the renderer is imported here, like the shapes' draw methods,
+    # so the physics never needs pygame
+    def draw(self, window):
+        from renderer import draw_lines
+        pos = self.system.pos
+        for rows in self.chains:
+            draw_lines(window, self.color, pos[rows].tolist())
 
 class AirDrag(SingleForce):
     def __init__(self, wind, **kwargs):
@@ -140,8 +270,9 @@ class AirDrag(SingleForce):
 
     
 class SpringRepulsion(PairForce):
-    def __init__(self, objects_list=[]):
-        self.objects_list = objects_list
+    def __init__(self, objects_list=None, **kwargs):
+        # Circles only push each other when they overlap, so a cutoff of twice the biggest radius loses nothing
+        super().__init__(objects_list, **kwargs)
 
     def force(self, a, b): # virtual function
         k = 1
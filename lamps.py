@@ -0,0 +1,59 @@
+# Lamp sequences: light shows played on a TimerWheel (timers.py).
+#
+# A sequence is a list of frames, each (seconds, changes): the frame's changes are made when it comes up and
+# it holds for seconds before the next one. changes is a list of (lamp, color), lamp being an index into the
+# lamps the sequence was made with, so a frame only touches the lamps that change in it. Nothing happens
+# between frames, so a lamp that isn't changing costs nothing per step.
+#
+# Each sequence has its own name on the wheel (its handler), and at most one timer waiting there, so it
+# saves and restores along with the wheel.
+
+class LampSequence:
+    def __init__(self, wheel, name, lamps, frames, loop=True):
+        self.wheel = wheel
+        self.name = name
+        self.lamps = lamps
+        self.frames = frames
+        self.loop = loop
+        # Frame showing now and the timer for the next one | None while stopped
+        self.frame = None
+        self.timer = None
+        wheel.handlers[name] = self.next_frame
+
+    def start(self, frame=0):
+        self.stop()
+        self.show(frame)
+
+    # Leaves the lamps as they are
+    def stop(self):
+        if self.timer is not None:
+            self.wheel.cancel(self.timer)
+        self.frame = None
+        self.timer = None
+
+    def running(self):
+        return self.frame is not None
+
+    def show(self, frame):
+        self.frame = frame
+        seconds, changes = self.frames[frame]
+        for lamp, color in changes:
+            self.lamps[lamp].color = color
+        self.timer = self.wheel.after(seconds, self.name)
+
+    def next_frame(self):
+        frame = self.frame + 1
+        if frame == len(self.frames):
+            if not self.loop:
+                self.frame = None
+                self.timer = None
+                return
+            frame = 0
+        self.show(frame)
+
+    ## Saving and restoring | the lamp colors are saved by whoever owns the lamps
+    def get_state(self):
+        return [self.frame, self.timer]
+
+    def set_state(self, state):
+        self.frame, self.timer = state
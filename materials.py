@@ -0,0 +1,96 @@
+import math
+from contact import bumper_rebound_speed
+
+# Materials: what the pieces of a table are made of, and so what a ball does when it hits them.
+#
+# Every shape has a material, as an index into the World's MaterialTable. It comes from the "material" of the
+# shape's entry in the table file, or else from its group (group_materials below), and balls are "ball".
+# A material has
+#   restitution - how much of the speed a ball hits it at comes back out of the bounce (0 to 1)
+#   friction    - how much of a ball's sliding along it a contact can take away (0 for none)
+#   rebound     - an active kick (bumpers), as a multiple of bumper_rebound_speed. A ball leaves anything with
+#                 a rebound at the speed it came in plus the kick, whatever the restitution
+#   score       - points for every step a ball touches it (sensors: for every time a ball comes onto it)
+# plus anything else the table file gives it (a sensor's cooldown), for whoever wants it.
+#
+# A contact goes by both of its shapes' materials together. Every pair is worked out once, into a table the
+# contact kernel just indexes: the bouncier of the two restitutions, the geometric mean of the frictions, and
+# the two rebounds and scores added up. "material_pairs" in a table file sets a pair outright:
+#   "material_pairs": {"ball/bumper": {"restitution": 0.5, "rebound": 2}}
+# Since the bouncier restitution wins, a ball's own restitution is a floor for everything it hits. So the World
+# params that tune a bounce (wall_restitution...) set the pair they are about, never a material on its own.
+
+# What the pieces of each group (see table.table_entries) are made of when their entry doesn't say
+group_materials = {"walls": "wall", "left_flipper": "wall", "left_flipper_pivot": "wall", "right_flipper": "wall",
+                   "right_flipper_pivot": "wall", "plunger": "wall", "bumpers": "bumper", "sensors": "sensor",
+                   "teleporter_entrance": "sensor"}
+
+class Material:
+    def __init__(self, name, values):
+        self.name = name
+        self.values = values
+        self.restitution = values.get("restitution", 0)
+        self.friction = values.get("friction", 0)
+        self.rebound = values.get("rebound", 0)
+        self.score = values.get("score", 0)
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+# Every material a table can use, in index order | the table's own, then the ones the groups and balls use.
+# "default" (nothing set) is always 0, for anything that was never given one.
+def material_names(materials):
+    names = ["default"]
+    for name in list(materials) + list(group_materials.values()) + ["ball"]:
+        if name not in names:
+            names.append(name)
+    return names
+
+class MaterialTable:
+    # materials and pairs are the table file's, defaults fill in whatever materials it leaves out and
+    # overrides (World params) win over its pairs | name or "first/second" -> {field: value}
+    def __init__(self, materials, pairs=None, defaults=None, overrides=None):
+        self.names = material_names(materials)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.materials = []
+        for name in self.names:
+            values = dict((defaults or {}).get(name, {}))
+            values.update(materials.get(name, {}))
+            self.materials.append(Material(name, values))
+
+        # pairs[i][j] -> (restitution, friction, rebound speed, score) for a contact between materials i and j
+        self.pairs = [[self.combine(a, b) for b in self.materials] for a in self.materials]
+        # Whatever is set for each pair, either way round | an override only replaces the fields it gives
+        given = {}
+        for key, values in list((pairs or {}).items()) + list((overrides or {}).items()):
+            first, _, second = key.partition("/")
+            i, j = sorted((self.lookup(first), self.lookup(second)))
+            given.setdefault((i, j), {}).update(values)
+        for (i, j), values in given.items():
+            self.pairs[i][j] = self.pairs[j][i] = self.combine(self.materials[i], self.materials[j], values)
+
+    def combine(self, a, b, given=None):
+        given = given or {}
+        restitution = given.get("restitution", max(a.restitution, b.restitution))
+        friction = given.get("friction", math.sqrt(a.friction * b.friction))
+        rebound = given.get("rebound", a.rebound + b.rebound)
+        score = given.get("score", a.score + b.score)
+        return (restitution, friction, bumper_rebound_speed * rebound, score)
+
+    def lookup(self, name):
+        if name not in self.index:
+            raise ValueError(f"unknown material {name!r}, the table has {', '.join(self.names)}")
+        return self.index[name]
+
+    def material(self, name):
+        return self.materials[self.lookup(name)]
+
+    # The Material a shape is made of
+    def of(self, shape):
+        return self.materials[shape.material]
+
+    def pair(self, a, b):
+        return self.pairs[a.material][b.material]
+
+    def named_pair(self, first, second):
+        return self.pairs[self.lookup(first)][self.lookup(second)]
@@ -0,0 +1,220 @@
+import numpy as np
+from vector import rotation
+
+# Batched circle vs polygon contact tests.
+# Does the same thing as Contact_Circle_Polygon.renew/overlap/normal/point, but for many balls and
+# many polygons at once, with every edge of every polygon packed into one set of arrays.
+
+# Every edge of a list of polygons, packed end to end
+# Edge i runs from points[prev[i]] to points[i] and has normals[i], the same as polygon.points/normals
+class EdgeBuffer:
+    def __init__(self, polygons=[]):
+        self.polygons = list(polygons)
+        self.slot = {id(polygon): k for k, polygon in enumerate(self.polygons)}
+
+        self.count = np.array([len(polygon.points) for polygon in self.polygons], dtype=np.intp)
+        self.start = np.zeros(len(self.polygons), dtype=np.intp)
+        if len(self.polygons) > 0:
+            self.start[1:] = np.cumsum(self.count)[:-1]
+        total = int(self.count.sum())
+
+        self.owner = np.repeat(np.arange(len(self.polygons)), self.count)
+        local = np.arange(total) - self.start[self.owner]
+        # Index of the previous vertex of the same polygon, wrapping around like points[i-1]
+        self.prev = np.where(local == 0, self.start[self.owner] + self.count[self.owner] - 1, np.arange(total) - 1)
+
+        self.points = np.zeros((total, 2))
+        self.normals = np.zeros((total, 2))
+        # Which polygons can take a side hint (see circle_polygon_contacts)
+        self.convex = np.array([polygon.convex for polygon in self.polygons], dtype=bool)
+        self.refresh()
+
+    # A buffer that was already packed (a compiled table) | the arrays are used as they are
+    @classmethod
+    def from_arrays(cls, polygons, count, start, owner, prev, points, normals):
+        edges = cls.__new__(cls)
+        edges.polygons = list(polygons)
+        edges.slot = {id(polygon): k for k, polygon in enumerate(edges.polygons)}
+        edges.count = np.asarray(count, dtype=np.intp)
+        edges.start = np.asarray(start, dtype=np.intp)
+        edges.owner = np.asarray(owner, dtype=np.intp)
+        edges.prev = np.asarray(prev, dtype=np.intp)
+        edges.points = points
+        edges.normals = normals
+        edges.convex = np.array([polygon.convex for polygon in edges.polygons], dtype=bool)
+        return edges
+
+    # Copy the polygons' current points and normals in
+    def refresh(self):
+        for polygon, start in zip(self.polygons, self.start):
+            for i, (point, normal) in enumerate(zip(polygon.points, polygon.normals)):
+                self.points[start + i] = (point.x, point.y)
+                self.normals[start + i] = (normal.x, normal.y)
+
+# The polygons that move (flippers, plunger, spinners), packed like an EdgeBuffer along with their offsets and
+# local normals. transform() poses all of them at once: sin/cos once per polygon, then one rotate-and-translate
+# over every vertex, straight into points/normals (which the contact kernel and the renderer read).
+# The polygons' own points/normals lists are only made from here when something asks for them (see Polygon).
+class VertexBuffer(EdgeBuffer):
+    def __init__(self, polygons=[]):
+        super().__init__(polygons)
+        self.offsets = np.array([(v.x, v.y) for polygon in self.polygons for v in polygon.offsets], dtype=float).reshape(-1, 2)
+        self.local_normals = np.array([(v.x, v.y) for polygon in self.polygons for v in polygon.local_normals],
+                                      dtype=float).reshape(-1, 2)
+        self.boxes = np.zeros((len(self.polygons), 4))
+        # (x, y, angle) each polygon was last posed at, and how many times the buffer has been posed
+        self.poses = None
+        self.version = 0
+        for k, polygon in enumerate(self.polygons):
+            polygon.buffer = self
+            polygon.slot = k
+        self.transform()
+
+    # Pose every polygon where it is now | returns True if anything had moved
+    def transform(self):
+        poses = [(polygon.pos.x, polygon.pos.y, polygon.angle) for polygon in self.polygons]
+        if poses == self.poses or not poses:
+            return False
+        self.poses = poses
+        owner = self.owner
+        pose = np.array(poses)
+        turn = np.array([rotation(angle) for angle in pose[:, 2]])
+        c = turn[owner, 0]
+        s = turn[owner, 1]
+        ox = self.offsets[:, 0]
+        oy = self.offsets[:, 1]
+        nx = self.local_normals[:, 0]
+        ny = self.local_normals[:, 1]
+        # point = pos + offset rotated, normal = local normal rotated
+        self.points[:, 0] = pose[owner, 0] + (c * ox - s * oy)
+        self.points[:, 1] = pose[owner, 1] + (s * ox + c * oy)
+        self.normals[:, 0] = c * nx - s * ny
+        self.normals[:, 1] = s * nx + c * ny
+        self.boxes[:, :2] = np.minimum.reduceat(self.points, self.start)
+        self.boxes[:, 2:] = np.maximum.reduceat(self.points, self.start)
+        for polygon, pose, box in zip(self.polygons, poses, self.boxes.tolist()):
+            polygon.pose = pose
+            polygon.box = tuple(box)
+        self.version += 1
+        return True
+
+    # Rows of points/normals for polygon k
+    def polygon_points(self, k):
+        return self.points[self.start[k]:self.start[k] + self.count[k]]
+
+    def polygon_normals(self, k):
+        return self.normals[self.start[k]:self.start[k] + self.count[k]]
+
+# The result of circle_polygon_contacts | one entry per (ball, polygon) pair
+class CirclePolygonContacts:
+    def __init__(self, ball, polygon, index, side, is_vertex, overlap, normal, point):
+        self.ball = ball            # index into the centers/radii that were passed in
+        self.polygon = polygon      # index into the EdgeBuffer's polygons
+        self.index = index          # side of least overlap, or the vertex, like Contact_Circle_Polygon.index
+        self.side = side            # side of least overlap (or the hint that ruled the pair out), for next step's hint
+        self.is_vertex = is_vertex
+        self.overlap = overlap
+        self.normal = normal
+        self.point = point
+
+    def __len__(self):
+        return len(self.ball)
+
+# Min-overlap side (or vertex), normal, overlap and contact point for every ball/polygon pair in one go.
+# With no pairs given, every ball is tested against every polygon in the buffer.
+# hint can give a side to try first for each pair (last step's side, -1 for none), like
+# Contact_Circle_Polygon.renew does. A ball fully outside that side of a convex polygon can't be touching it,
+# so the pair comes back with that side's (negative) overlap and its edges are never scanned.
+def circle_polygon_contacts(centers, radii, edges, pair_ball=None, pair_poly=None, hint=None):
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(centers),))
+    if pair_ball is None:
+        pair_ball = np.repeat(np.arange(len(centers)), len(edges.polygons))
+        pair_poly = np.tile(np.arange(len(edges.polygons)), len(centers))
+    pair_ball = np.asarray(pair_ball, dtype=np.intp)
+    pair_poly = np.asarray(pair_poly, dtype=np.intp)
+
+    pairs = len(pair_ball)
+    if pairs == 0:
+        return CirclePolygonContacts(pair_ball, pair_poly, np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp),
+                                     np.zeros(0, dtype=bool), np.zeros(0), np.zeros((0, 2)), np.zeros((0, 2)))
+
+    c = centers[pair_ball]
+    r = radii[pair_ball]
+    if hint is not None:
+        hint = np.asarray(hint, dtype=np.intp)
+        tried = np.flatnonzero((hint >= 0) & edges.convex[pair_poly])
+        if len(tried):
+            edge = edges.start[pair_poly[tried]] + hint[tried]
+            normal = edges.normals[edge]
+            hint_overlap = r[tried] - np.einsum("ij,ij->i", c[tried] - edges.points[edge], normal)
+            clear = hint_overlap < 0
+            if clear.any():
+                # Only the pairs the hint didn't rule out are scanned, and the two lots are put back in order
+                scan = np.ones(pairs, dtype=bool)
+                scan[tried[clear]] = False
+                index = hint.copy()
+                side = hint.copy()
+                is_vertex = np.zeros(pairs, dtype=bool)
+                overlap = np.zeros(pairs)
+                normals = np.zeros((pairs, 2))
+                point = np.zeros((pairs, 2))
+                done = tried[clear]
+                overlap[done] = hint_overlap[clear]
+                normals[done] = normal[clear]
+                point[done] = c[done] - normal[clear] * r[done, None]
+                if scan.any():
+                    found = scan_edges(c[scan], r[scan], edges, pair_poly[scan])
+                    index[scan], side[scan], is_vertex[scan], overlap[scan], normals[scan], point[scan] = found
+                return CirclePolygonContacts(pair_ball, pair_poly, index, side, is_vertex, overlap, normals, point)
+    return CirclePolygonContacts(pair_ball, pair_poly, *scan_edges(c, r, edges, pair_poly))
+
+# Every edge of every pair's polygon, for circles c (radii r) | the guts of circle_polygon_contacts
+# Returns the vertex or side index, the side, is_vertex, overlap, normal and point of each pair
+def scan_edges(c, r, edges, pair_poly):
+    pairs = len(pair_poly)
+    # Lay every edge of every pair out flat | seg[j] is the pair that flat edge j belongs to
+    counts = edges.count[pair_poly]
+    seg_start = np.cumsum(counts) - counts
+    seg = np.repeat(np.arange(pairs), counts)
+    edge = edges.start[pair_poly][seg] + (np.arange(len(seg)) - seg_start[seg])
+
+    # Overlap with each side | radius - (circle.pos - wall_pos) . wall_normal
+    flat_overlap = r[seg] - np.einsum("ij,ij->i", c[seg] - edges.points[edge], edges.normals[edge])
+
+    # Side of least overlap per pair, taking the first one on ties like the python loop does
+    min_overlap = np.minimum.reduceat(flat_overlap, seg_start)
+    is_min = np.flatnonzero(flat_overlap == min_overlap[seg])
+    _, first = np.unique(seg[is_min], return_index=True)
+    best = edge[is_min[first]]
+
+    ## Round off the endpoints
+    # Check if the circle is beyond one of the two endpoints of that side
+    point1 = edges.points[best]
+    prev = edges.prev[best]
+    point2 = edges.points[prev]
+    side = point1 - point2
+    beyond1 = np.einsum("ij,ij->i", c - point1, side) > 0
+    beyond2 = ~beyond1 & (np.einsum("ij,ij->i", c - point2, side) < 0)
+    is_vertex = beyond1 | beyond2
+    vertex = np.where(beyond2, prev, best)
+
+    # Side contacts
+    normal = edges.normals[best].copy()
+    overlap = min_overlap.copy()
+    point = c - normal * r[:, None]
+
+    # Vertex contacts | same as two circles where the vertex has radius zero
+    if is_vertex.any():
+        offset = c[is_vertex] - edges.points[vertex[is_vertex]]
+        distance = np.sqrt(np.einsum("ij,ij->i", offset, offset))
+        overlap[is_vertex] = r[is_vertex] - distance
+        safe = distance > 0
+        vertex_normal = normal[is_vertex]
+        # times 1/distance rather than / distance, the same as Vector2 division (and so Contact_Circle_Polygon)
+        vertex_normal[safe] = offset[safe] * (1.0 / distance[safe, None])
+        normal[is_vertex] = vertex_normal
+        point[is_vertex] = edges.points[vertex[is_vertex]]
+
+    start = edges.start[pair_poly]
+    return vertex - start, best - start, is_vertex, overlap, normal, point
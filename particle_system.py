@@ -0,0 +1,143 @@
+import numpy as np
+from physics_objects import inverse
+
+# Struct-of-arrays storage for particles.
+# Every body added here keeps its mass, position, velocity, force, angle, angular velocity, torque
+# and moment of inertia in one row of these arrays, and the whole lot is integrated in one numpy step.
+# The Particle objects stay usable as before, their fields just read and write the row (see SystemField).
+
+class ParticleSystem:
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.particles = []
+        # Bodies with points that have to follow the integrated pose (polygons)
+        self.shapes = []
+        # SpringNetworks (forces.py) holding row numbers, kept pointing at the same particles by remove
+        self.networks = []
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        old_count = self.count
+        self.capacity = capacity
+
+        def grow(old, shape, dtype=float):
+            new = np.zeros(shape, dtype=dtype)
+            if old is not None:
+                new[:old_count] = old[:old_count]
+            return new
+
+        self.mass = grow(getattr(self, "mass", None), capacity)
+        self.inv_mass = grow(getattr(self, "inv_mass", None), capacity)
+        self.pos = grow(getattr(self, "pos", None), (capacity, 2))
+        self.vel = grow(getattr(self, "vel", None), (capacity, 2))
+        self.force = grow(getattr(self, "force", None), (capacity, 2))
+        self.angle = grow(getattr(self, "angle", None), capacity)
+        self.avel = grow(getattr(self, "avel", None), capacity)
+        self.torque = grow(getattr(self, "torque", None), capacity)
+        self.momi = grow(getattr(self, "momi", None), capacity)
+        self.inv_momi = grow(getattr(self, "inv_momi", None), capacity)
+        # Sleeping bodies are skipped by gravity and integration
+        self.awake = grow(getattr(self, "awake", None), capacity, bool)
+        # How long each body has been (nearly) still
+        self.sleep_timer = grow(getattr(self, "sleep_timer", None), capacity)
+
+    # Move a particle's state into the arrays. From now on the particle is a view of row `index`.
+    def add(self, particle):
+        if particle.system is not None:
+            raise ValueError("particle already belongs to a ParticleSystem")
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+
+        i = self.count
+        self.mass[i] = particle.mass
+        self.inv_mass[i] = inverse(particle.mass)
+        self.pos[i] = tuple(particle.pos)
+        self.vel[i] = tuple(particle.vel)
+        self.force[i] = tuple(particle.force)
+        self.angle[i] = particle.angle
+        self.avel[i] = particle.avel
+        self.torque[i] = particle.torque
+        self.momi[i] = particle.momi
+        self.inv_momi[i] = inverse(particle.momi)
+        self.awake[i] = particle.awake
+        self.sleep_timer[i] = 0
+
+        self.count += 1
+        self.particles.append(particle)
+        if hasattr(particle, "update_points"):
+            self.shapes.append(particle)
+        particle.system = self
+        particle.index = i
+        return i
+
+    # Hand a particle its state back and fill the hole with the last row
+    # A particle that is still in a spring can't go, the spring would be left with nothing on one end
+    def remove(self, particle):
+        if particle.system is not self:
+            raise ValueError("particle does not belong to this ParticleSystem")
+        if any(network.uses(particle.index) for network in self.networks):
+            raise ValueError("particle is still in a SpringNetwork")
+        state = {name: getattr(particle, name) for name in ("mass", "pos", "vel", "force", "angle", "avel", "torque", "momi", "awake")}
+        i = particle.index
+        last = self.count - 1
+        if i != last:
+            for array in (self.mass, self.inv_mass, self.pos, self.vel, self.force, self.angle,
+                          self.avel, self.torque, self.momi, self.inv_momi, self.awake, self.sleep_timer):
+                array[i] = array[last]
+            moved = self.particles[last]
+            moved.index = i
+            self.particles[i] = moved
+            for network in self.networks:
+                network.moved(last, i)
+        self.particles.pop()
+        self.count -= 1
+        if particle in self.shapes:
+            self.shapes.remove(particle)
+
+        particle.system = None
+        particle.index = None
+        for name, value in state.items():
+            setattr(particle, name, value)
+
+    def clear_forces(self):
+        self.force[:self.count] = 0
+
+    # F = ma for every awake body with a finite mass
+    def add_acceleration(self, acc):
+        n = self.count
+        mass = np.where((self.inv_mass[:n] > 0) & self.awake[:n], self.mass[:n], 0.0)
+        self.force[:n] += mass[:, None] * (acc[0], acc[1])
+
+    # Same semi-implicit Euler step as Particle.update, for every awake row at once
+    def integrate(self, dt):
+        rows = np.flatnonzero(self.awake[:self.count])
+        # update velocity using the current force
+        self.vel[rows] += self.force[rows] * (self.inv_mass[rows, None] * dt)
+        # update position using the newly updated velocity
+        self.pos[rows] += self.vel[rows] * dt
+
+        # Rotation
+        self.avel[rows] += self.torque[rows] * self.inv_momi[rows] * dt
+        self.angle[rows] += self.avel[rows] * dt
+
+        for shape in self.shapes:
+            if shape.awake:
+                shape.update_points()
+
+    # Add dt to the timer of every awake body that is moving slower than both speeds, and reset everyone else.
+    # Returns a mask of the rows that have been that still for at least time_to_sleep.
+    def sleep_candidates(self, dt, linear_speed, angular_speed, time_to_sleep):
+        n = self.count
+        speed2 = (self.vel[:n] ** 2).sum(axis=1)
+        still = self.awake[:n] & (speed2 < linear_speed ** 2) & (np.abs(self.avel[:n]) < angular_speed)
+        self.sleep_timer[:n] = np.where(still, self.sleep_timer[:n] + dt, 0.0)
+        return self.sleep_timer[:n] >= time_to_sleep
+
+    def sleep(self, i):
+        self.awake[i] = False
+        self.vel[i] = 0
+        self.avel[i] = 0
+
+    def wake(self, i):
+        self.awake[i] = True
+        self.sleep_timer[i] = 0
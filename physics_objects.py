@@ -1,12 +1,119 @@
-from locale import normalize
 import math
-from zoneinfo import available_timezones
-from pygame.math import Vector2
-import pygame
+from vector import Vector2
+
+# Body types
+# static    - table geometry that never moves. Points/normals/aabb are worked out once and it is never integrated
+# kinematic - moved by the game, not by forces (plunger, flippers). Geometry is redone only when the pose changes
+# dynamic   - moved by forces and contacts (balls)
+STATIC = "static"
+KINEMATIC = "kinematic"
+DYNAMIC = "dynamic"
+
+# 1/x, with infinite mass (or moment of inertia) giving 0
+def inverse(value):
+    if value == math.inf:
+        return 0.0
+    return 1 / value
+
+# What a vector field hands out while its particle is in a ParticleSystem: a copy of the row, and a read-only
+# one, since changing it in place (particle.pos.x += 1) would only change the copy. Set the whole field instead
+# (particle.pos = ...), which is what +=, -=, *= and /= on it do.
+class RowVector(Vector2):
+    __slots__ = ()
+
+    def __init__(self, x, y):
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "y", y)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"a particle's {name} can't be changed in place while it is in a ParticleSystem, "
+                             "set the whole vector (particle.pos = ...)")
+
+    def __setitem__(self, i, value):
+        self.__setattr__("xy"[i], value)
+
+    # A new vector, for the field to be set to
+    def __iadd__(self, other):
+        return self + other
+
+    def __isub__(self, other):
+        return self - other
+
+    def __imul__(self, other):
+        return self * other
+
+    def __itruediv__(self, other):
+        return self / other
+
+# A particle field that lives on the particle (in the _name slot) until it is added to a ParticleSystem.
+# After that it reads and writes the particle's row in the system's arrays instead, and a vector field
+# reads as a RowVector (see above).
+class SystemField:
+    def __init__(self, vector=False, inverse=None):
+        self.vector = vector
+        # Name of the field holding 1/value, kept in sync when the value is set (inv_mass, inv_momi)
+        self.inverse = inverse
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = "_" + name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        system = obj.system
+        if system is None:
+            return getattr(obj, self.slot)
+        array = getattr(system, self.name)
+        i = obj.index
+        if self.vector:
+            return RowVector(array.item(i, 0), array.item(i, 1))
+        return array.item(i)
+
+    def __set__(self, obj, value):
+        system = obj.system
+        if system is None:
+            setattr(obj, self.slot, value)
+            if self.inverse is not None:
+                setattr(obj, "_" + self.inverse, inverse(value))
+            return
+        array = getattr(system, self.name)
+        i = obj.index
+        if self.vector:
+            array[i, 0] = value[0]
+            array[i, 1] = value[1]
+        else:
+            array[i] = value
+            if self.inverse is not None:
+                getattr(system, self.inverse)[i] = inverse(value)
 
 class Particle:
+    # Bodies have a fixed set of fields (no __dict__), so there are lots of them cheaply and every lookup is a slot
+    __slots__ = ("system", "index", "body_type", "contact_type", "_mass", "_inv_mass", "_pos", "_vel", "_force",
+                 "_momi", "_inv_momi", "_angle", "_avel", "_torque", "_awake", "material")
+
+    mass = SystemField(inverse="inv_mass")
+    # 1/mass and 1/momi, 0 for infinite | set along with mass and momi, so the solvers never divide
+    inv_mass = SystemField()
+    pos = SystemField(vector=True)
+    vel = SystemField(vector=True)
+    force = SystemField(vector=True)
+    momi = SystemField(inverse="inv_momi")
+    inv_momi = SystemField()
+    angle = SystemField()
+    avel = SystemField()
+    torque = SystemField()
+    awake = SystemField()
+
     def __init__(self, mass=math.inf, pos=(0,0), vel=(0,0),
-                       momi=math.inf, angle=0, avel=0, torque=0):
+                       momi=math.inf, angle=0, avel=0, torque=0, body_type=None):
+        # ParticleSystem this particle is a view into, and its row there (see particle_system.py)
+        self.system = None
+        self.index = None
+        # Anything with a finite mass gets pushed around, everything else is assumed to stay put
+        if body_type is None:
+            body_type = DYNAMIC if mass != math.inf else STATIC
+        self.body_type = body_type
         self.mass = mass
         self.pos = Vector2(pos)
         self.vel = Vector2(vel)
@@ -14,6 +121,10 @@ class Particle:
         self.angle = angle
         self.avel = avel
         self.torque = torque
+        # Sleeping bodies aren't pushed, moved or checked for contacts until something wakes them
+        self.awake = True
+        # What it is made of, as an index into the World's MaterialTable (see materials.py) | 0 is "default"
+        self.material = 0
         self.clear_force() # clear_force() belongs to our object self
         
         self.clear_force()
@@ -26,22 +137,58 @@ class Particle:
         #
 
     def update(self, dt):
+        # Static bodies never move, and sleeping ones don't until they are woken
+        if self.body_type == STATIC or not self.awake:
+            return
         # update velocity using the current force
-        self.vel += (self.force / self.mass) * dt
+        self.vel += (self.force * self.inv_mass) * dt
         # update position using the newly updated velocity
         self.pos += self.vel * dt
 
         # Rotation
-        self.avel += (self.torque/self.momi) * dt
+        self.avel += (self.torque * self.inv_momi) * dt
         self.angle += self.avel*dt
     
     def impulse(self, impulse):        
-        self.vel += impulse/self.mass
+        self.vel += impulse * self.inv_mass
 
     def delta_pos(self, delta):
         self.pos += delta
 
+    ## Plain float access for the contact solver (contact.py), so it doesn't make a Vector2 for every read and write
+    # (x, y, vx, vy, avel)
+    def motion(self):
+        system = self.system
+        if system is None:
+            pos = self._pos
+            vel = self._vel
+            return pos.x, pos.y, vel.x, vel.y, self._avel
+        i = self.index
+        pos = system.pos
+        vel = system.vel
+        return pos.item(i, 0), pos.item(i, 1), vel.item(i, 0), vel.item(i, 1), system.avel.item(i)
+
+    def set_position(self, x, y):
+        system = self.system
+        if system is None:
+            pos = self._pos
+            pos.x = x
+            pos.y = y
+        else:
+            system.pos[self.index] = (x, y)
+
+    def set_velocity(self, vx, vy):
+        system = self.system
+        if system is None:
+            vel = self._vel
+            vel.x = vx
+            vel.y = vy
+        else:
+            system.vel[self.index] = (vx, vy)
+
 class Circle(Particle):
+    __slots__ = ("radius", "color", "width")
+
     def __init__(self, radius = 10, color = [255, 255, 255], width = 0, **kwargs):
         # **kwargs is a dictionary to catch all the other keyword arguments
         self.radius = radius
@@ -51,10 +198,19 @@ class Circle(Particle):
         # **kwargs unpacking the kwargs dictionary into key=value, key=value, etc
         self.contact_type="Circle"
 
+    # Drawing lives in renderer.py, which (and pygame with it) is only imported the first time something is drawn
     def draw(self, window):
-        pygame.draw.circle(window, self.color, self.pos, self.radius, self.width)
+        from renderer import draw_circle
+        draw_circle(window, self)
+
+    # Axis aligned bounding box | (xmin, ymin, xmax, ymax)
+    def aabb(self):
+        return (self.pos.x - self.radius, self.pos.y - self.radius,
+                self.pos.x + self.radius, self.pos.y + self.radius)
 
 class Wall(Particle):
+    __slots__ = ("point1", "point2", "normal", "color", "width")
+
     def __init__(self, point1, point2, reverse=False, color=[0,0,0], width=1):
         # Two endpoints of the wall (visually)
         # Wall behaves as if it's infinite
@@ -71,11 +227,28 @@ class Wall(Particle):
             self.normal *= -1
 
     def draw(self, screen):
-        pygame.draw.line(screen, self.color, self.point1, self.point2, self.width)
+        from renderer import draw_wall
+        draw_wall(screen, self)
+
+    # Walls are infinite, so they have no bounding box. Anything that culls by box has to always test them.
+    def aabb(self):
+        return None
+
+# True if every point is on the inside of every side | a convex polygon whose normals point out. Anything else
+# (a dent, or normals pointing in) can't take the shortcuts that rely on that (Contact_Circle_Polygon.renew)
+def is_convex(offsets, normals):
+    for point, normal in zip(offsets, normals):
+        for other in offsets:
+            if (other - point).dot(normal) > 1e-6:
+                return False
+    return True
 
 # A polygon's points are interpreted as offsets from the position. 
 # They are returned in a list of lists | Ex: offsets = [ [-10, -10], [10, -10], [10, 10], [-10, 10] ]
 class Polygon(Particle):
+    __slots__ = ("offsets", "local_normals", "color", "width", "normals_length", "_points", "_normals", "pose", "box",
+                 "buffer", "slot", "unpacked", "convex")
+
     def __init__(self, offsets=[], color=[255,255,255], width=0, normals_length=0, reverse=False, **kwargs):
         
         self.contact_type = "Polygon"
@@ -92,37 +265,106 @@ class Polygon(Particle):
             if reverse:
                 normal *= -1
             self.local_normals.append(normal)
+        self.convex = is_convex(self.offsets, self.local_normals)
         
         self.color = color
         self.width = width
         self.normals_length = normals_length
+        # VertexBuffer (narrowphase.py) that poses this polygon along with the other moving ones, and its slot there
+        self.buffer = None
+        self.slot = None
+        # Buffer version the points/normals lists were last made from
+        self.unpacked = None
 
         super().__init__(**kwargs)
         
         self.points = self.offsets.copy()
         self.normals = self.local_normals.copy()
+        # Static polygons only ever get this one call
         self.update_points()
 
+    # Make a polygon from geometry that was already worked out (a compiled table, see table.py)
+    # Lists of (x, y) for the offsets, local normals, points and normals, and the box around the points
+    @classmethod
+    def from_geometry(cls, offsets, local_normals, points, normals, box, color=[255,255,255], width=0, normals_length=0, **kwargs):
+        polygon = cls.__new__(cls)
+        polygon.contact_type = "Polygon"
+        polygon.offsets = [Vector2(offset) for offset in offsets]
+        polygon.local_normals = [Vector2(normal) for normal in local_normals]
+        polygon.convex = is_convex(polygon.offsets, polygon.local_normals)
+        polygon.color = color
+        polygon.width = width
+        polygon.normals_length = normals_length
+        polygon.buffer = None
+        polygon.slot = None
+        polygon.unpacked = None
+        Particle.__init__(polygon, **kwargs)
+        polygon.points = [Vector2(point) for point in points]
+        polygon.normals = [Vector2(normal) for normal in normals]
+        polygon.pose = (polygon.pos.x, polygon.pos.y, polygon.angle)
+        polygon.box = box
+        return polygon
+
+    # A polygon in a VertexBuffer is posed there, all at once with the others. Its points and normals are only
+    # turned back into Vector2s (for the contact classes, ccd, debug drawing) when they are asked for.
+    @property
+    def points(self):
+        if self.buffer is not None and self.unpacked != self.buffer.version:
+            self.unpack()
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+
+    @property
+    def normals(self):
+        if self.buffer is not None and self.unpacked != self.buffer.version:
+            self.unpack()
+        return self._normals
+
+    @normals.setter
+    def normals(self, normals):
+        self._normals = normals
+
+    def unpack(self):
+        self._points = [Vector2(x, y) for x, y in self.buffer.polygon_points(self.slot).tolist()]
+        self._normals = [Vector2(x, y) for x, y in self.buffer.polygon_normals(self.slot).tolist()]
+        self.unpacked = self.buffer.version
+
     # Compute where the vertices are in space | Iterate through all of the offsets and calc the points
     def update_points(self):
+        if self.buffer is not None:
+            self.buffer.transform()
+            return
         for i in range(len(self.offsets)):
             self.points[i] = self.pos + self.offsets[i].rotate_rad(self.angle) # point = pos + offset
             self.normals[i] = self.local_normals[i].rotate_rad(self.angle)
             # rotate_rad must be included because the polygon might be rotated
+
+        # Remember the pose the points were made for, and the box around them
+        self.pose = (self.pos.x, self.pos.y, self.angle)
+        xs = [point.x for point in self.points]
+        ys = [point.y for point in self.points]
+        self.box = (min(xs), min(ys), max(xs), max(ys))
     
     def draw(self, window):
-        pygame.draw.polygon(window, self.color, self.points, self.width)
-        if (self.normals_length > 0):
-            for i in range(len(self.normals)):
-                pygame.draw.line(window, [0,0,0], self.points[i], 
-                                                  self.points[i] + self.normals[i] * self.normals_length)
+        from renderer import draw_polygon
+        draw_polygon(window, self)
+
+    def aabb(self):
+        return self.box
 
     # Need to override update from Particle, to include updating the points
     def update(self, dt):
+        if self.body_type == STATIC:
+            return
         # First, update the Particle things
         super().update(dt)
-        # Next, update the points
-        self.update_points()
+        # Next, update the points, but only if the polygon actually moved or turned
+        # (ones in a VertexBuffer are posed together when whoever owns the buffer calls transform())
+        if self.buffer is None and (self.pos.x, self.pos.y, self.angle) != self.pose:
+            self.update_points()
 
 #------------------------------------------------------#
 # Rotation and polygon class
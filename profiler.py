@@ -0,0 +1,127 @@
+import sys
+import csv
+import json
+import time
+import numpy as np
+
+# Where the frame time goes.
+# The game loop and World.step call lap(phase) at the end of each phase, which adds the time since the last
+# lap to that phase, and count(name, n) for the counters. Every frame ends up as one row of a fixed-size ring
+# buffer, so a long session never grows memory. Times are stored in seconds and shown/dumped in ms.
+
+phases = ("input", "wall_contacts", "ball_contacts", "bumper_contacts", "resolve", "sensors", "forces", "integration",
+          "render", "present")
+# net_blocks is how many more memory blocks Python was holding on to at the end of the frame than at the start.
+# Blocks freed within the frame cancel out the ones allocated, so it shows growth, not how many temporaries a
+# frame made and threw away.
+counters = ("pairs_tested", "contacts_resolved", "net_blocks")
+columns = phases + counters
+
+# How many frames go by between refreshes of the overlay text
+overlay_every = 30
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, frames=600):
+        self.index = {name: i for i, name in enumerate(columns)}
+        self.samples = np.zeros((frames, len(columns)))
+        self.frames = 0
+        self.row = np.zeros(len(columns))
+        self.last = time.perf_counter()
+        self.blocks = sys.getallocatedblocks()
+        self.overlay = None
+
+    def begin_frame(self):
+        self.row[:] = 0
+        self.blocks = sys.getallocatedblocks()
+        self.last = time.perf_counter()
+
+    # Charge the time since the last lap to phase
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.row[self.index[phase]] += now - self.last
+        self.last = now
+
+    def count(self, name, n=1):
+        self.row[self.index[name]] += n
+
+    def end_frame(self):
+        self.row[self.index["net_blocks"]] = sys.getallocatedblocks() - self.blocks
+        self.samples[self.frames % len(self.samples)] = self.row
+        self.frames += 1
+
+    # Recorded frames, oldest first
+    def history(self):
+        size = len(self.samples)
+        if self.frames <= size:
+            return self.samples[:self.frames]
+        start = self.frames % size
+        return np.concatenate((self.samples[start:], self.samples[:start]))
+
+    # Mean of every column over the recorded frames | times in ms
+    def averages(self):
+        history = self.history()
+        if len(history) == 0:
+            return {name: 0.0 for name in columns}
+        mean = history.mean(axis=0)
+        return {name: mean[i] * 1000 if name in phases else mean[i] for i, name in enumerate(columns)}
+
+    # Same rows as history() with the times in ms
+    def rows(self):
+        history = self.history().copy()
+        history[:, :len(phases)] *= 1000
+        return history
+
+    def dump_csv(self, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("frame",) + columns)
+            first = self.frames - len(self.history())
+            for i, row in enumerate(self.rows()):
+                writer.writerow([first + i] + [round(value, 4) for value in row])
+
+    def dump_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"columns": columns,
+                       "time_unit": "ms",
+                       "frames": self.frames,
+                       "averages": self.averages(),
+                       "rows": self.rows().round(4).tolist()}, file)
+
+    # Text in the top left corner with the averages | returns the rect it covered
+    def draw(self, window, font, pos=(10, 10)):
+        import pygame
+        if self.overlay is None or self.frames % overlay_every == 0:
+            averages = self.averages()
+            total = sum(averages[name] for name in phases)
+            lines = [f"frame {total:.2f} ms"]
+            lines += [f"{name} {averages[name]:.2f} ms" for name in phases]
+            lines += [f"{name} {averages[name]:.0f}" for name in counters]
+            surfaces = [font.render(line, True, [255, 255, 0]) for line in lines]
+            height = sum(surface.get_height() for surface in surfaces)
+            width = max(surface.get_width() for surface in surfaces)
+            self.overlay = pygame.Surface((width, height))
+            y = 0
+            for surface in surfaces:
+                self.overlay.blit(surface, (0, y))
+                y += surface.get_height()
+        return window.blit(self.overlay, pos)
+
+# Stands in for a Profiler when nobody is looking, so the calls in the hot path cost next to nothing
+class NullProfiler:
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def end_frame(self):
+        pass
+
+null_profiler = NullProfiler()
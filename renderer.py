@@ -0,0 +1,205 @@
+import math
+import pygame
+from world import width, height, bg_color1
+from physics_objects import STATIC
+
+# Draws the world without redrawing the whole table every frame.
+#
+# Everything that can't move or change color (walls, bumpers, most of the decor) is drawn once into two cached
+# layers: the background (walls and objects) and an overlay (the decor in gfx_objs, drawn over the board).
+# Each frame only the live things (balls, flippers, plunger, score pads, teleporter, flashing lights, the ball
+# arm) are checked. Where one of them moved or changed color, that patch of the screen is rebuilt from the
+# cached layers and only those patches are sent to the display.
+
+# Extra pixels around each box so outlines and rounding don't leave trails
+rect_padding = 2
+
+class Renderer:
+    def __init__(self, window, font, world):
+        self.window = window
+        self.font = font
+        self.world = world
+        # HUD text is only rendered again when it changes | slot -> (text, surface, rect)
+        self.hud = {}
+        # Rects something else drew over, to be put back next frame
+        self.marked = []
+        self.bake()
+
+    # Things the game moves or recolors itself (they aren't simulated, so they look static)
+    def animated(self):
+        world = self.world
+        return world.bonus_zones + world.flashing_gfx + [world.save_ball_tele_entr, world.ball_arm]
+
+    # Draw everything that never changes into the cached layers and work out what has to be drawn live
+    def bake(self):
+        world = self.world
+        changing = {id(obj) for obj in self.animated()}
+
+        self.background = pygame.Surface((width, height)).convert()
+        self.background.fill([0,0,0])
+        pygame.draw.rect(self.background, bg_color1, [0, 0, width, height])
+        self.overlay = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
+        self.overlay.fill((0, 0, 0, 0))
+
+        self.live_bodies = split_layer(unique(world.walls + world.objects), changing, self.background)
+        self.live_gfx = split_layer(world.gfx_objs, changing, self.overlay)
+
+        # What every live thing looked like the last time it was drawn | id -> (rect, color)
+        self.drawn = {}
+        self.layer_sizes = (len(world.walls), len(world.objects), len(world.gfx_objs))
+        self.full_redraw = True
+
+    def hud_items(self):
+        world = self.world
+        items = [("balls", f"BALLS REMAINING: {world.balls_left}", (255,255,255), (width/2, 90)),
+                 ("score", f"SCORE: {world.score}", (255, 255, 255), (width/2, 120))]
+        if world.game_over:
+            items.append(("game_over", f"GAME OVER", (255, 10, 100), (width/2, height/2-100)))
+        return items
+
+    # Redraw whatever changed since the last frame | returns the rects of the screen that were touched
+    def draw(self):
+        world = self.world
+        # Something was added (the multiball), so the layers have to be worked out again
+        if self.layer_sizes != (len(world.walls), len(world.objects), len(world.gfx_objs)):
+            self.bake()
+
+        dirty = self.marked
+        self.marked = []
+        for obj in self.live_bodies + self.live_gfx:
+            state = (item_rect(obj), tuple(obj.color))
+            before = self.drawn.get(id(obj))
+            if before != state:
+                if before is not None:
+                    dirty.append(before[0])
+                dirty.append(state[0])
+                self.drawn[id(obj)] = state
+
+        # HUD text
+        shown = set()
+        for slot, text, color, center in self.hud_items():
+            shown.add(slot)
+            before = self.hud.get(slot)
+            if before is not None and before[0] == text:
+                continue
+            surface = self.font.render(text, True, color)
+            rect = surface.get_rect(center=center)
+            if before is not None:
+                dirty.append(before[2])
+            dirty.append(rect)
+            self.hud[slot] = (text, surface, rect)
+        for slot in list(self.hud):
+            if slot not in shown:
+                dirty.append(self.hud.pop(slot)[2])
+
+        if self.full_redraw:
+            dirty = [pygame.Rect(0, 0, width, height)]
+            self.full_redraw = False
+        # Live things are always redrawn whole (pygame fills a clipped polygon's edges a little differently),
+        # so each patch grows to cover everything live that it touches
+        rects = [self.drawn[id(obj)][0] for obj in self.live_bodies + self.live_gfx]
+        while True:
+            dirty = merge_rects(dirty)
+            grown = [rect.unionall([other for other in rects if rect.colliderect(other)]) for rect in dirty]
+            if grown == dirty:
+                break
+            dirty = grown
+
+        # Rebuild each dirty patch in the same order as a full redraw would
+        window = self.window
+        for rect in dirty:
+            window.set_clip(rect)
+            window.blit(self.background, rect, rect)
+            for obj in self.live_bodies:
+                if rect.colliderect(self.drawn[id(obj)][0]):
+                    obj.draw(window)
+            window.blit(self.overlay, rect, rect)
+            for obj in self.live_gfx:
+                if rect.colliderect(self.drawn[id(obj)][0]):
+                    obj.draw(window)
+            for text, surface, text_rect in self.hud.values():
+                if rect.colliderect(text_rect):
+                    window.blit(surface, text_rect)
+        window.set_clip(None)
+        return dirty
+
+    # Something outside the renderer drew over rect this frame (the profiler overlay)
+    def mark_dirty(self, rect):
+        self.marked.append(pygame.Rect(rect))
+
+    # Send only the changed parts of the frame to the screen
+    def present(self, rects):
+        if rects:
+            pygame.display.update(rects)
+
+# Draw the fixed things in a layer onto surface and return the ones that have to be drawn every frame.
+# A fixed thing drawn after (on top of) something live that it overlaps is kept live too, so the order things
+# are drawn in stays the same (the balls on the ends of the flippers).
+def split_layer(objs, changing, surface):
+    live = []
+    for obj in objs:
+        moves = obj.body_type != STATIC or id(obj) in changing
+        covers_live = obj.aabb() is not None and any(item_rect(obj).colliderect(item_rect(other)) for other in live)
+        if moves or covers_live:
+            live.append(obj)
+        else:
+            obj.draw(surface)
+    return live
+
+# The same object can be in more than one list (the plunger and flippers are in walls and objects)
+def unique(objs):
+    seen = set()
+    result = []
+    for obj in objs:
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            result.append(obj)
+    return result
+
+## Shapes | physics_objects.py and forces.py call these to draw themselves
+def draw_circle(window, circle):
+    pygame.draw.circle(window, circle.color, circle.pos, circle.radius, circle.width)
+
+def draw_wall(window, wall):
+    pygame.draw.line(window, wall.color, wall.point1, wall.point2, wall.width)
+
+def draw_polygon(window, polygon):
+    # Moving polygons are drawn straight from the rows their VertexBuffer posed them into
+    if polygon.buffer is not None:
+        points = polygon.buffer.polygon_points(polygon.slot).tolist()
+    else:
+        points = polygon.points
+    pygame.draw.polygon(window, polygon.color, points, polygon.width)
+    if (polygon.normals_length > 0):
+        for i in range(len(polygon.normals)):
+            pygame.draw.line(window, [0,0,0], polygon.points[i],
+                                              polygon.points[i] + polygon.normals[i] * polygon.normals_length)
+
+def draw_line(window, color, start, end):
+    pygame.draw.line(window, color, start, end)
+
+# An open line through every point, in one call
+def draw_lines(window, color, points):
+    pygame.draw.lines(window, color, False, points)
+
+# Screen rect around a shape's box
+def item_rect(obj):
+    x0, y0, x1, y1 = obj.aabb()
+    left = math.floor(x0) - rect_padding
+    top = math.floor(y0) - rect_padding
+    return pygame.Rect(left, top, math.ceil(x1) + rect_padding - left + 1, math.ceil(y1) + rect_padding - top + 1)
+
+# Join rects that overlap, so nothing gets redrawn twice in a frame
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import zlib
+import time
+import bisect
+import hashlib
+import argparse
+import numpy as np
+from vector import Vector2
+from world import World, Inputs
+from table import table_dir
+
+# Recording and replaying games exactly.
+#
+# The World is deterministic: the same starting state and the same inputs every step give the same game, down
+# to the last bit. So a recording is just the buttons held on every step, plus the odd debug event (dropping
+# the ball with the mouse). Buttons are 3 bits per step and barely change from one step to the next, so they
+# are stored as runs (bits, how many steps), a few bytes per button press.
+#
+# Every keyframe_every steps the whole World state (World.get_state) is saved too, as zlib'd json (under 1 kB
+# each with a couple of balls, so at the default of every 5 seconds an hour is well under a MB).
+# Seeking to a step restores the last keyframe at or before it and steps forward from there, so a seek never
+# has to go further than one keyframe interval.
+#
+#   python replay.py game.replay                play the whole thing back headless, as fast as it goes
+#   python replay.py game.replay --seek 12000   jump to step 12000 and print the score and balls there
+#   python replay.py game.replay --verify       check every keyframe comes out the same when played back
+
+replay_magic = b"PBREPLAY"
+replay_version = 5
+
+# One bit per button
+plunger_bit = 1
+left_flipper_bit = 2
+right_flipper_bit = 4
+
+# A run is packed as (steps << run_shift) | bits
+run_shift = 3
+
+def input_bits(inputs):
+    return ((plunger_bit if inputs.plunger else 0) | (left_flipper_bit if inputs.left_flipper else 0)
+            | (right_flipper_bit if inputs.right_flipper else 0))
+
+def bits_inputs(bits):
+    return Inputs(plunger=bool(bits & plunger_bit), left_flipper=bool(bits & left_flipper_bit),
+                  right_flipper=bool(bits & right_flipper_bit))
+
+def pack_state(state):
+    return zlib.compress(json.dumps(state, separators=(",", ":")).encode(), 9)
+
+def unpack_state(data):
+    return json.loads(zlib.decompress(data))
+
+def file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+# What a replay calls its table | the path under tables/ for the tables that ship with the game, so it means
+# the same thing in any checkout, or else the path as given
+def table_name(path):
+    relative = os.path.relpath(os.path.abspath(path), table_dir)
+    if relative.startswith(os.pardir):
+        return path
+    return relative.replace(os.sep, "/")
+
+# The table file a replay was recorded on, by name and the hash of the file | the name under tables/ (or as
+# given) first, then any other table in tables/ that is the same file under a different name
+def find_table(name, digest):
+    candidates = [os.path.join(table_dir, *name.split("/")), name]
+    candidates += sorted(os.path.join(table_dir, file) for file in os.listdir(table_dir) if file.endswith(".json"))
+    for path in candidates:
+        if os.path.isfile(path) and file_hash(path) == digest:
+            return path
+    raise ValueError(f"no table matching {name} as it was recorded (it has changed, or isn't in {table_dir})")
+
+# Stands in for the World while playing (see pinball.py --record): everything goes through to the world,
+# and every step's buttons get written down on the way
+class Recorder:
+    def __init__(self, world, dt, keyframe_every=1200):
+        self.world = world
+        self.dt = dt
+        self.keyframe_every = keyframe_every
+        self.steps = 0
+        # [bits, steps] for each run of the same buttons
+        self.runs = []
+        # [step, name, args...] | things that aren't buttons, applied just before that step
+        self.events = []
+        # (step, packed state) | state after that many steps
+        self.keyframes = [(0, pack_state(world.get_state()))]
+
+    # DEBUG | drop the ball wherever the mouse is
+    def place_ball(self, pos):
+        pos = Vector2(pos)
+        self.events.append([self.steps, "place_ball", pos.x, pos.y])
+        self.world.place_ball(pos)
+
+    def step(self, dt, inputs):
+        if dt != self.dt:
+            raise ValueError(f"recording at a fixed dt of {self.dt}, got {dt}")
+        bits = input_bits(inputs)
+        if self.runs and self.runs[-1][0] == bits:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([bits, 1])
+        self.world.step(dt, inputs)
+        self.steps += 1
+        if self.steps % self.keyframe_every == 0:
+            self.keyframes.append((self.steps, pack_state(self.world.get_state())))
+
+    def replay(self):
+        table = self.world.table_path
+        header = {"version": replay_version, "table": table_name(table), "table_hash": file_hash(table),
+                  "params": self.world.params, "dt": self.dt,
+                  "steps": self.steps, "keyframe_every": self.keyframe_every, "events": self.events}
+        runs = np.array([(steps << run_shift) | bits for bits, steps in self.runs], dtype=np.uint32)
+        return Replay(header, runs, self.keyframes)
+
+    def save(self, path):
+        self.replay().save(path)
+
+class Replay:
+    def __init__(self, header, runs, keyframes):
+        self.header = header
+        self.dt = header["dt"]
+        self.steps = header["steps"]
+        self.table = header["table"]
+        self.events = {}
+        for event in header["events"]:
+            self.events.setdefault(event[0], []).append(event[1:])
+        self.runs = np.asarray(runs, dtype=np.uint32)
+        # First step of every run, for finding the buttons at any step with a binary search
+        lengths = (self.runs >> run_shift).astype(np.int64)
+        self.run_starts = (np.cumsum(lengths) - lengths).tolist()
+        self.run_bits = (self.runs & ((1 << run_shift) - 1)).tolist()
+        self.keyframes = list(keyframes)
+        self.keyframe_steps = [step for step, data in self.keyframes]
+
+    ## File
+    # Layout: magic, header length (4 bytes), json header, zlib'd runs, then the keyframes one after another.
+    # The header says where each keyframe is, so loading doesn't unpack any of them.
+    def save(self, path):
+        runs = zlib.compress(self.runs.astype("<u4").tobytes(), 9)
+        header = dict(self.header)
+        header["runs"] = [len(self.runs), len(runs)]
+        header["keyframes"] = [[step, len(data)] for step, data in self.keyframes]
+        text = json.dumps(header, separators=(",", ":")).encode()
+        with open(path, "wb") as file:
+            file.write(replay_magic)
+            file.write(len(text).to_bytes(4, "little"))
+            file.write(text)
+            file.write(runs)
+            for step, data in self.keyframes:
+                file.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        if data[:len(replay_magic)] != replay_magic:
+            raise ValueError(f"{path} is not a replay")
+        start = len(replay_magic) + 4
+        length = int.from_bytes(data[len(replay_magic):start], "little")
+        header = json.loads(data[start:start + length])
+        if header["version"] != replay_version:
+            raise ValueError(f"{path} is replay version {header['version']}, this reads {replay_version}")
+        offset = start + length
+        count, size = header.pop("runs")
+        runs = np.frombuffer(zlib.decompress(data[offset:offset + size]), dtype="<u4", count=count)
+        offset += size
+        keyframes = []
+        for step, size in header.pop("keyframes"):
+            keyframes.append((step, data[offset:offset + size]))
+            offset += size
+        return cls(header, runs, keyframes)
+
+    ## Playing
+    def inputs_at(self, step):
+        return bits_inputs(self.run_bits[bisect.bisect_right(self.run_starts, step) - 1])
+
+    # Apply anything that happened just before step and return the buttons for it
+    def apply(self, world, step):
+        for name, *args in self.events.get(step, ()):
+            if name == "place_ball":
+                world.place_ball(Vector2(args[0], args[1]))
+        return self.inputs_at(step)
+
+    # A fresh World on the table this was recorded on, at step 0
+    def world(self):
+        world = World(find_table(self.table, self.header["table_hash"]), self.header.get("params"))
+        world.set_state(unpack_state(self.keyframes[0][1]))
+        return world
+
+    # Step world from step start up to (not including) end
+    def play(self, world, start=0, end=None):
+        if end is None:
+            end = self.steps
+        dt = self.dt
+        for step in range(start, end):
+            world.step(dt, self.apply(world, step))
+        return world
+
+    # The World as it was after step steps | from the nearest keyframe, not from the start
+    def seek(self, step, world=None):
+        step = min(max(step, 0), self.steps)
+        k = bisect.bisect_right(self.keyframe_steps, step) - 1
+        if world is None:
+            world = self.world()
+        start, data = self.keyframes[k]
+        world.set_state(unpack_state(data))
+        return self.play(world, start, step)
+
+    # Play from the start and compare the state at every keyframe | returns the steps that didn't match
+    def verify(self):
+        world = self.world()
+        bad = []
+        done = 0
+        for step, data in self.keyframes[1:]:
+            self.play(world, done, step)
+            done = step
+            if world.get_state() != unpack_state(data):
+                bad.append(step)
+        return bad
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back a recorded game headless")
+    parser.add_argument("path")
+    parser.add_argument("--seek", type=int, help="only go to this step")
+    parser.add_argument("--verify", action="store_true", help="check the playback against every keyframe")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    print(f"{args.path}: {replay.steps} steps at {1 / replay.dt:.0f} per second, {len(replay.runs)} input runs, "
+          f"{len(replay.keyframes)} keyframes")
+    start = time.perf_counter()
+    if args.verify:
+        bad = replay.verify()
+        print(f"{len(replay.keyframes) - 1 - len(bad)} of {len(replay.keyframes) - 1} keyframes match "
+              f"({time.perf_counter() - start:.2f} s)")
+        if bad:
+            print(f"first mismatch at step {bad[0]}")
+            sys.exit(1)
+        return
+    step = replay.steps if args.seek is None else args.seek
+    world = replay.seek(step)
+    seconds = time.perf_counter() - start
+    print(f"step {step}: score {world.score}, balls left {world.balls_left} ({seconds:.2f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import math
+from bvh import BVH
+from narrowphase import EdgeBuffer, circle_polygon_contacts
+
+# Sensors: table pieces that notice balls but never push them (score pads, the teleporter, rollover lanes,
+# targets). A sensor wraps the shape it is drawn as. The shapes go in their own BVH, so each step only the
+# sensors near a ball are looked at, and nothing is resolved or kept in the ContactManager.
+#
+# A ball is inside once it is more than depth into the shape. The callbacks are called with (sensor, ball):
+#   on_enter - the step a ball comes in
+#   on_stay  - every step after that while it is still in
+#   on_exit  - the step it leaves
+# A sleeping ball isn't checked, so it stays in (or out) until it wakes up.
+#
+# enabled is separate from anything drawn. fire() switches a sensor off, for cooldown seconds or (with no
+# cooldown) until enable() is called. With colors given, the shape is recolored to match.
+# The cooldown is a one-shot on the TimerWheel the sensors were handed (timers.py), so a sensor that's off
+# costs nothing per step and the timer saves and restores along with the wheel.
+
+class Sensor:
+    def __init__(self, shape, depth=0, cooldown=0, colors=None, on_enter=None, on_stay=None, on_exit=None):
+        self.shape = shape
+        self.depth = depth
+        self.cooldown = cooldown
+        # (on color, off color), or None to leave the shape's color alone
+        self.colors = colors
+        self.on_enter = on_enter
+        self.on_stay = on_stay
+        self.on_exit = on_exit
+        self.enabled = True
+        # Where the cooldown goes | the wheel and the (handler name, args) it calls, set by Sensors
+        self.wheel = None
+        self.relight = None
+        # The cooldown timer waiting on the wheel, if it's counting down
+        self.timer = None
+        # Balls inside it right now
+        self.inside = []
+        self.recolor()
+
+    def aabb(self):
+        return self.shape.aabb()
+
+    def fire(self):
+        self.enabled = False
+        self.cancel()
+        if self.cooldown > 0 and self.wheel is not None:
+            self.timer = self.wheel.after(self.cooldown, *self.relight)
+        self.recolor()
+
+    def enable(self):
+        self.enabled = True
+        self.cancel()
+        self.recolor()
+
+    def cancel(self):
+        if self.timer is not None:
+            self.wheel.cancel(self.timer)
+            self.timer = None
+
+    # Seconds until it switches back on
+    def cooldown_left(self):
+        if self.timer is None:
+            return 0
+        return self.wheel.remaining(self.timer)
+
+    def recolor(self):
+        if self.colors is not None:
+            self.shape.color = self.colors[0] if self.enabled else self.colors[1]
+
+# wheel is the TimerWheel the cooldowns go on, under the handler name given
+class Sensors:
+    def __init__(self, sensors, wheel, name="sensors"):
+        self.sensors = list(sensors)
+        self.wheel = wheel
+        wheel.handlers[name] = self.cooled_down
+        for i, sensor in enumerate(self.sensors):
+            sensor.wheel = wheel
+            sensor.relight = (name, i)
+        self.tree = BVH(self.sensors)
+        # Polygon sensors go through the batched kernel together, circles are worked out one by one
+        self.edges = EdgeBuffer([sensor.shape for sensor in self.sensors if sensor.shape.contact_type == "Polygon"])
+        self.slot = [self.edges.slot.get(id(sensor.shape)) for sensor in self.sensors]
+        # Indexes of the sensors with balls in them
+        self.occupied = set()
+
+    # A sensor's cooldown timer came up
+    def cooled_down(self, i):
+        sensor = self.sensors[i]
+        sensor.timer = None
+        sensor.enable()
+
+    # Check the (awake) balls against the sensors near them and call whatever changed
+    # boxes are the balls' boxes for the step (World.ball_boxes) | returns how many (ball, sensor) pairs were tested
+    def update(self, balls, boxes):
+        # Which balls (by position in balls) are inside which sensors | sensor index -> set
+        found = {}
+        tested = 0
+        pair_ball = []
+        pair_poly = []
+        pair_sensor = []
+        for b, (ball, box) in enumerate(zip(balls, boxes)):
+            for i in self.tree.query_indices(box):
+                sensor = self.sensors[i]
+                shape = sensor.shape
+                tested += 1
+                if shape.contact_type == "Circle":
+                    dx = ball.pos.x - shape.pos.x
+                    dy = ball.pos.y - shape.pos.y
+                    if (shape.radius + ball.radius) - math.sqrt(dx * dx + dy * dy) > sensor.depth:
+                        found.setdefault(i, set()).add(b)
+                else:
+                    pair_ball.append(b)
+                    pair_poly.append(self.slot[i])
+                    pair_sensor.append(i)
+        if pair_ball:
+            centers = [(ball.pos.x, ball.pos.y) for ball in balls]
+            radii = [ball.radius for ball in balls]
+            hits = circle_polygon_contacts(centers, radii, self.edges, pair_ball, pair_poly)
+            for k, overlap in enumerate(hits.overlap.tolist()):
+                i = pair_sensor[k]
+                if overlap > self.sensors[i].depth:
+                    found.setdefault(i, set()).add(pair_ball[k])
+
+        # Work out the changes first and call them after, in sensor order, so a callback moving a ball
+        # (the teleporter) can't change what the others see this step
+        checked = {id(ball) for ball in balls}
+        events = []
+        for i in sorted(self.occupied | set(found)):
+            sensor = self.sensors[i]
+            now = [balls[b] for b in sorted(found.get(i, ()))]
+            before = sensor.inside
+            for ball in now:
+                events.append((sensor.on_stay if ball in before else sensor.on_enter, i, ball))
+            for ball in before:
+                if id(ball) in checked and ball not in now:
+                    events.append((sensor.on_exit, i, ball))
+            # Sleeping balls weren't checked, so they stay where they were
+            sensor.inside = now + [ball for ball in before if id(ball) not in checked]
+            if sensor.inside:
+                self.occupied.add(i)
+            else:
+                self.occupied.discard(i)
+
+        for callback, i, ball in events:
+            if callback is not None:
+                callback(self.sensors[i], ball)
+        return tested
+
+    # A ball is leaving the table | it just stops being in anything, without an exit
+    def forget(self, ball):
+        for i in list(self.occupied):
+            sensor = self.sensors[i]
+            if ball in sensor.inside:
+                sensor.inside = [other for other in sensor.inside if other is not ball]
+                if not sensor.inside:
+                    self.occupied.discard(i)
+
+    ## Saving and restoring | balls is World.balls, inside is saved as positions in it
+    # The cooldown timers themselves are saved with the wheel, this only keeps their ids
+    def get_state(self, balls):
+        return [[sensor.enabled, sensor.timer, [balls.index(ball) for ball in sensor.inside]]
+                for sensor in self.sensors]
+
+    def set_state(self, state, balls):
+        self.occupied = set()
+        for i, (sensor, (enabled, timer, inside)) in enumerate(zip(self.sensors, state)):
+            sensor.enabled = enabled
+            sensor.timer = timer
+            sensor.inside = [balls[b] for b in inside]
+            sensor.recolor()
+            if sensor.inside:
+                self.occupied.add(i)
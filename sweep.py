@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from world import World, Inputs, tunables
+from table import default_table
+
+# Parameter sweeps: lots of headless games with different tuning values, spread over every core.
+#
+# A sweep is a list of runs, each one a set of tuning values (see world.tunables) and a seed. The values come
+# from a grid (every combination) or a random sample within ranges, and every set is played once per seed.
+# Each run is one game played by the Autopilot until it is over or the time runs out.
+#
+# Results go into a directory as they come in, one file per column (run, seed, each tuning value, score, ...)
+# that every finished run appends a value to. The run column is written last, so its length is how many rows
+# are complete. Stopping a sweep part way (Ctrl-C, a crash, a reboot) loses only the games being played, and
+# running it again with the same directory picks up the runs that are missing.
+#
+#   python sweep.py out --grid flipper_ang_accel=0.5,0.7,0.9 --grid gravity=400,490,600 --seeds 8
+#   python sweep.py out --sample 200 --range plunger_accel=30:80 --range wall_restitution=0.1:0.6 --seeds 4
+#   python sweep.py out     carry on with an unfinished sweep (or just print the summary of a finished one)
+
+sweep_version = 1
+
+# What each game reports, after the run, seed and tuning values
+result_columns = [("score", "<i8"), ("balls_left", "<i8"), ("drains", "<i8"), ("game_over", "<i8"),
+                  ("steps", "<i8"), ("game_time", "<f8"), ("wall_time", "<f8")]
+
+# Plays the game well enough to keep the ball going for a while, so the tuning values get exercised.
+# Launches with a random pull and flips when a ball comes down onto a flipper. seed picks the pulls and
+# how quick the flips are, so the same seed and world play the same game.
+class Autopilot:
+    def __init__(self, world, seed=0, hold=(0.8, 2.0), reaction=(0.0, 0.06), flip_time=0.15):
+        self.world = world
+        self.rng = random.Random(seed)
+        self.hold = hold
+        self.reaction = reaction
+        self.flip_time = flip_time
+        self.time = 0
+        self.pull_until = None
+        # Per flipper: when to press (after the reaction time), and when to let go
+        self.press_at = [None, None]
+        self.release_at = [0, 0]
+        self.flippers = []
+        for flipper in (world.left_flipper, world.right_flipper):
+            reach = max(offset.magnitude() for offset in flipper.offsets)
+            side = 1 if flipper.offsets[1].x > 0 else -1
+            self.flippers.append((flipper, reach, side))
+
+    # A ball coming down over the flipper (or sat on it), close enough to hit
+    def in_reach(self, ball, flipper, reach, side):
+        along = (ball.pos.x - flipper.pos.x) * side
+        above = flipper.pos.y - ball.pos.y
+        coming = ball.vel.y > 0 or ball.vel.magnitude_squared() < 400
+        return coming and -ball.radius <= along <= reach + ball.radius and -ball.radius <= above <= reach * 0.6
+
+    # Resting in the plunger lane
+    def waiting(self, ball):
+        plunger = self.world.plunger
+        return (abs(ball.pos.x - plunger.pos.x) < 20 and ball.pos.y < plunger.pos.y
+                and ball.vel.magnitude_squared() < 100)
+
+    # Buttons for the next step of dt
+    def inputs(self, dt):
+        world = self.world
+        now = self.time
+        self.time += dt
+
+        if self.pull_until is None and self.waiting(world.ball_in_play):
+            self.pull_until = now + self.rng.uniform(*self.hold)
+        plunger = self.pull_until is not None and now < self.pull_until
+        if self.pull_until is not None and not plunger and not self.waiting(world.ball_in_play):
+            self.pull_until = None
+
+        pressed = []
+        for i, (flipper, reach, side) in enumerate(self.flippers):
+            if any(self.in_reach(ball, flipper, reach, side) for ball in world.balls):
+                if self.press_at[i] is None and now >= self.release_at[i]:
+                    self.press_at[i] = now + self.rng.uniform(*self.reaction)
+            if self.press_at[i] is not None and now >= self.press_at[i]:
+                self.press_at[i] = None
+                # Hold it up a moment, then leave it down a moment before the next flip
+                self.release_at[i] = now + self.flip_time
+            pressed.append(now < self.release_at[i])
+        return Inputs(plunger=plunger, left_flipper=pressed[0], right_flipper=pressed[1])
+
+# One game | the result columns for it
+def play(table, params, seed, seconds, dt):
+    start = time.perf_counter()
+    world = World(table, params)
+    pilot = Autopilot(world, seed)
+    steps = int(round(seconds / dt))
+    drains = 0
+    balls_left = world.balls_left
+    step = 0
+    while step < steps and not world.game_over:
+        world.step(dt, pilot.inputs(dt))
+        step += 1
+        if world.balls_left < balls_left:
+            drains += balls_left - world.balls_left
+        balls_left = world.balls_left
+    return {"score": world.score, "balls_left": world.balls_left, "drains": drains, "game_over": int(world.game_over),
+            "steps": step, "game_time": step * dt, "wall_time": time.perf_counter() - start}
+
+# Every run in the sweep, in order | [run, params, seed]
+def sweep_runs(spec):
+    names = spec["params"]
+    if spec["grid"] is not None:
+        sets = itertools.product(*(spec["grid"][name] for name in names))
+    else:
+        rng = np.random.default_rng(spec["sample_seed"])
+        lows = [spec["ranges"][name][0] for name in names]
+        highs = [spec["ranges"][name][1] for name in names]
+        sets = rng.uniform(lows, highs, (spec["sample"], len(names))).tolist()
+    runs = []
+    for values in sets:
+        for seed in range(spec["seeds"]):
+            runs.append([len(runs), dict(zip(names, values)), seed])
+    return runs
+
+def spec_columns(spec):
+    return [("run", "<i8"), ("seed", "<i8")] + [(name, "<f8") for name in spec["params"]] + result_columns
+
+def column_path(path, name):
+    return os.path.join(path, name + ".bin")
+
+# Everything that was finished | {column name: array}
+def load_results(path):
+    with open(os.path.join(path, "sweep.json")) as file:
+        spec = json.load(file)
+    columns = {name: np.fromfile(column_path(path, name), dtype=dtype) if os.path.exists(column_path(path, name))
+               else np.zeros(0, dtype=dtype) for name, dtype in spec_columns(spec)}
+    rows = len(columns["run"])
+    return {name: values[:rows] for name, values in columns.items()}
+
+# Appends rows to the column files of a sweep directory
+class ResultWriter:
+    def __init__(self, path, spec):
+        self.columns = spec_columns(spec)
+        run_path = column_path(path, "run")
+        rows = os.path.getsize(run_path) // 8 if os.path.exists(run_path) else 0
+        self.files = {}
+        for name, dtype in self.columns:
+            column = column_path(path, name)
+            # Throw away anything past the last complete row (the sweep was stopped part way through writing one)
+            if os.path.exists(column) and os.path.getsize(column) > rows * np.dtype(dtype).itemsize:
+                os.truncate(column, rows * np.dtype(dtype).itemsize)
+            self.files[name] = open(column, "ab")
+
+    def write(self, row):
+        # run goes last, so a row only counts once every other column has it
+        for name, dtype in self.columns[1:] + self.columns[:1]:
+            file = self.files[name]
+            file.write(np.array([row[name]], dtype=dtype).tobytes())
+            file.flush()
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+# The sweep directory's spec, made from the arguments the first time and checked against them after that
+def open_sweep(path, spec):
+    spec_path = os.path.join(path, "sweep.json")
+    if os.path.exists(spec_path):
+        with open(spec_path) as file:
+            saved = json.load(file)
+        if spec is not None and spec != saved:
+            raise ValueError(f"{path} holds a different sweep, use another directory for this one")
+        return saved
+    if spec is None:
+        raise ValueError(f"{path} has no sweep in it yet, give --grid or --sample")
+    os.makedirs(path, exist_ok=True)
+    with open(spec_path, "w") as file:
+        json.dump(spec, file, indent=1)
+    return spec
+
+def parse_values(text, separator):
+    name, _, values = text.partition("=")
+    if name not in tunables:
+        raise ValueError(f"can't sweep {name}, these can be set: {', '.join(tunables)}")
+    return name, [float(value) for value in values.split(separator)]
+
+def make_spec(args):
+    if args.grid and args.sample:
+        raise ValueError("give either --grid or --sample, not both")
+    if not args.grid and not args.sample:
+        return None
+    spec = {"version": sweep_version, "table": args.table, "seconds": args.seconds, "dt": 1 / args.rate,
+            "seeds": args.seeds, "grid": None, "sample": None, "ranges": None, "sample_seed": None}
+    if args.grid:
+        spec["grid"] = dict(parse_values(text, ",") for text in args.grid)
+        spec["params"] = list(spec["grid"])
+    else:
+        spec["ranges"] = dict(parse_values(text, ":") for text in args.range)
+        if any(len(bounds) != 2 for bounds in spec["ranges"].values()):
+            raise ValueError("ranges are name=low:high")
+        spec["params"] = list(spec["ranges"])
+        spec["sample"] = args.sample
+        spec["sample_seed"] = args.sample_seed
+    return spec
+
+# Mean score and game time for each set of tuning values
+def summary(path, spec):
+    results = load_results(path)
+    names = spec["params"]
+    sets = {}
+    for i in range(len(results["run"])):
+        key = tuple(results[name][i] for name in names)
+        sets.setdefault(key, []).append(i)
+    print(" ".join(f"{name:>18}" for name in names) + f" {'games':>6} {'score':>8} {'game time':>10}")
+    for key, rows in sorted(sets.items(), key=lambda item: -results["score"][item[1]].mean()):
+        print(" ".join(f"{value:18.4g}" for value in key) + f" {len(rows):6} {results['score'][rows].mean():8.0f}"
+              f" {results['game_time'][rows].mean():9.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play lots of headless games over a grid or sample of tuning values")
+    parser.add_argument("path", help="directory the results go in")
+    parser.add_argument("--grid", action="append", metavar="NAME=A,B,C", help="try every one of these values")
+    parser.add_argument("--sample", type=int, help="this many random sets of values from the --range's")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LOW:HIGH")
+    parser.add_argument("--sample-seed", type=int, default=1)
+    parser.add_argument("--seeds", type=int, default=4, help="games per set of values")
+    parser.add_argument("--seconds", type=float, default=120, help="most game time per game")
+    parser.add_argument("--rate", type=int, default=240, help="physics steps per second")
+    parser.add_argument("--table", default=default_table)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    try:
+        spec = open_sweep(args.path, make_spec(args))
+    except ValueError as error:
+        sys.exit(error)
+    runs = sweep_runs(spec)
+    done = set(load_results(args.path)["run"].tolist())
+    todo = [run for run in runs if run[0] not in done]
+    print(f"{len(runs)} runs, {len(done)} done already, {len(todo)} to go on {args.workers} workers")
+
+    writer = ResultWriter(args.path, spec)
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers)
+    try:
+        futures = {executor.submit(play, spec["table"], params, seed, spec["seconds"], spec["dt"]): (run, params, seed)
+                   for run, params, seed in todo}
+        for count, future in enumerate(as_completed(futures), 1):
+            run, params, seed = futures[future]
+            row = dict(future.result(), run=run, seed=seed, **params)
+            writer.write(row)
+            if count % 100 == 0 or count == len(todo):
+                print(f"{count}/{len(todo)} ({time.perf_counter() - start:.0f} s)")
+    except KeyboardInterrupt:
+        print("stopped, run it again to carry on")
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+        sys.exit(1)
+    executor.shutdown()
+    writer.close()
+    summary(args.path, spec)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import os
+import json
+import math
+import hashlib
+import tempfile
+import numpy as np
+from vector import Vector2
+from physics_objects import Circle, Polygon, Wall, STATIC, KINEMATIC
+from bvh import BVH
+from narrowphase import EdgeBuffer
+from materials import group_materials, material_names
+
+# Tables are described in json files (see tables/default.json) instead of being built in code.
+#
+# A table file lists its pieces by group: walls, bumpers, sensors (score pads), decor, lights, the two flippers,
+# the plunger, the teleporter and where the ball goes, plus the colors and materials they use (a piece can name
+# its own "material", see materials.py). Every piece is one of a few primitives (wall, circle, polygon, box,
+# board_poly, curve, flipper), which are the create_* functions below.
+#
+# Building all of those polygons (normalizing and rotating every offset), the broadphase trees and the packed
+# edge buffers only happens the first time a table file is seen. The result is saved in one binary file in
+# tables/cache, named after a hash of the table file, and from then on loading the table is a single
+# memory-mapped read of that file.
+
+table_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+default_table = os.path.join(table_dir, "default.json")
+cache_dir = os.path.join(table_dir, "cache")
+# Bump this whenever the cache layout or the primitives change, so old caches get rebuilt
+cache_version = 2
+cache_magic = b"PBTABLE1"
+cache_alignment = 64
+
+def convert_degree(degrees):
+    converted_radians = (math.pi/180) * degrees
+    return converted_radians
+
+## Primitives
+def create_curve(side_length, center_pos, center_angle, facing_left, height_multiplier, corner_offset, color):
+    # center_angle (degree)| Adjusts the sharpness of the curve
+    # corner_offset (int)| Adjusts how close triangles are to the center triangle
+    # Returns the list of triangles that make up the curve
+    y_swap = 1
+    if facing_left == True:
+        y_swap = -1
+
+    curve = []
+    curve.append(create_turn(side_length, (center_pos.x-corner_offset, center_pos.y + y_swap * corner_offset), -center_angle, facing_left, height_multiplier, color))
+    curve.append(create_turn(side_length, (center_pos.x, center_pos.y), 0, facing_left, height_multiplier, color))
+    curve.append(create_turn(side_length, (center_pos.x+corner_offset, center_pos.y - y_swap * corner_offset), center_angle, facing_left, height_multiplier, color))
+
+    # Adding additional walls because the curve needed more smoothing
+    if facing_left == True:
+        curve.append(create_turn(side_length, (center_pos.x-(corner_offset*1.5), center_pos.y + y_swap * corner_offset), -center_angle/2, facing_left, height_multiplier, color))
+        curve.append(create_turn(side_length, (center_pos.x+(corner_offset/2), center_pos.y -y_swap * corner_offset), center_angle/2, facing_left, height_multiplier, color))
+    else:
+        curve.append(create_turn(side_length, (center_pos.x-(corner_offset/2), center_pos.y + y_swap * corner_offset), -center_angle/2, facing_left, height_multiplier, color))
+        curve.append(create_turn(side_length, (center_pos.x+(corner_offset*1.5), center_pos.y -y_swap * corner_offset), center_angle/2, facing_left, height_multiplier, color))
+    return curve
+
+def create_box(width_size, height_size, box_pos, wall_width, in_color, body_type=STATIC):
+    # Creates boxes by width and height
+    return Polygon(
+        body_type=body_type,
+        offsets=[Vector2(-width_size, -height_size), Vector2(width_size, -height_size), Vector2(width_size, height_size), Vector2(-width_size, height_size)],
+        pos=(box_pos),
+        width=wall_width,
+        reverse=False,
+        normals_length=1,
+        color=in_color
+    )
+
+def create_flipper(total_length, total_height, starting_pos, facing_left, rest_angle, color=[20, 120, 120]):
+    if facing_left == True:
+    # Sets offsets to face left
+        temp_offsets=[Vector2(0,0), Vector2(-total_length, 0), Vector2(-total_length, total_height/2), Vector2(0, total_height)]
+    else:
+        temp_offsets=[Vector2(0,0), Vector2(total_length, 0),Vector2(total_length, total_height/2), Vector2(0, total_height)]
+    return Polygon(
+        offsets = temp_offsets,
+        pos = starting_pos,
+        angle = rest_angle,
+        reverse = facing_left,
+        color=color,
+        # Flippers are driven by the controls, not by forces
+        body_type = KINEMATIC
+    )
+
+def create_turn(side_length, edge_pos, center_angle, facing_left, height_multiplier, color):
+    # edge_pos is the centerpoint for the triangle
+    # height_multiplier adjusts the height of the peak of the triangle (int)
+    if facing_left == True:
+        # Sets offsets to face left
+        temp_offsets=[Vector2(-side_length, -side_length/height_multiplier), Vector2(side_length, -side_length/height_multiplier), Vector2(side_length, side_length/height_multiplier)]
+    else:
+        temp_offsets=[Vector2(-side_length, -side_length/height_multiplier), Vector2(side_length, -side_length/height_multiplier), Vector2(-side_length, side_length/height_multiplier)]
+
+    return Polygon(
+        offsets=temp_offsets,
+        pos=(edge_pos),
+        angle = (convert_degree(center_angle)),
+        reverse=False,
+        color=color
+    )
+
+# x_pos_offset is measured out from the middle of the board, y_pos_offset up from the bottom
+def create_board_poly(board_size, x_pos_offset, y_pos_offset, offset, facing_left, in_color):
+    side_check = 1
+    if not facing_left:
+        side_check *= -1
+        for obj in offset:
+            obj.x *= -1
+
+    return Polygon (
+        pos=(board_size[0]/2 + side_check * x_pos_offset, board_size[1] - y_pos_offset),
+        offsets=offset,
+        color=in_color,
+        reverse=facing_left,
+
+        # DETELE AFTER DEBUG!!!!!!!
+        width=1
+    )
+
+# Table file entry -> list of physics objects
+def build_piece(entry, table):
+    kind = entry["type"]
+    color = table.color(entry.get("color", [255, 255, 255]))
+    body_type = entry.get("body_type", STATIC)
+    if kind == "wall":
+        pieces = [Wall(point1=Vector2(entry["point1"]), point2=Vector2(entry["point2"]), reverse=entry.get("reverse", False),
+                       color=color, width=entry.get("line_width", 1))]
+    elif kind == "circle":
+        pieces = [Circle(radius=entry["radius"], pos=Vector2(entry["pos"]), color=color, width=entry.get("line_width", 0))]
+    elif kind == "polygon":
+        pieces = [Polygon(pos=Vector2(entry["pos"]), offsets=entry["offsets"], color=color, reverse=entry.get("reverse", False),
+                          width=entry.get("line_width", 0), body_type=body_type)]
+    elif kind == "box":
+        width_size, height_size = entry["half_size"]
+        pieces = [create_box(width_size, height_size, Vector2(entry["pos"]), entry.get("line_width", 0), color, body_type)]
+    elif kind == "board_poly":
+        pieces = [create_board_poly(table.size, entry["x"], entry["y"], [Vector2(offset) for offset in entry["offsets"]],
+                                    entry["facing_left"], color)]
+    elif kind == "curve":
+        pieces = create_curve(entry["side_length"], Vector2(entry["center"]), entry["angle"], entry["facing_left"],
+                              entry["height_multiplier"], entry["corner_offset"], color)
+    elif kind == "flipper":
+        pieces = [create_flipper(entry["length"], entry["height"], Vector2(entry["pos"]), entry["facing_left"],
+                                 convert_degree(entry["rest_angle"]), color)]
+    else:
+        raise ValueError(f"unknown table piece type {kind!r}")
+    return pieces
+
+# Every entry of a table file in build order, with the group it goes in
+def table_entries(spec):
+    for group in ("walls", "bumpers", "sensors", "decor", "lights"):
+        for entry in spec.get(group, []):
+            yield group, entry
+    for side in ("left", "right"):
+        flipper = spec["flippers"][side]
+        yield side + "_flipper", flipper
+        yield side + "_flipper_pivot", flipper["pivot"]
+    yield "plunger", spec["plunger"]
+    yield "teleporter_entrance", spec["teleporter"]["entrance"]
+    yield "teleporter_exit", spec["teleporter"]["exit"]
+
+# The parts of a built table, ready to be put in a World
+class TablePieces:
+    def __init__(self, groups):
+        self.walls = groups.get("walls", [])
+        self.bumpers = groups.get("bumpers", [])
+        self.sensors = groups.get("sensors", [])
+        self.decor = groups.get("decor", [])
+        self.lights = groups.get("lights", [])
+        self.left_flipper = groups["left_flipper"][0]
+        self.left_flipper_pivot = groups["left_flipper_pivot"][0]
+        self.right_flipper = groups["right_flipper"][0]
+        self.right_flipper_pivot = groups["right_flipper_pivot"][0]
+        self.plunger = groups["plunger"][0]
+        self.teleporter_entrance = groups["teleporter_entrance"][0]
+        self.teleporter_exit = groups["teleporter_exit"][0]
+        self.one_way_gate = None
+        self.wall_tree = None
+        self.bumper_tree = None
+        self.wall_edges = None
+        self.bumper_edges = None
+
+class Table:
+    def __init__(self, spec, header, arrays):
+        # The table file's own settings (colors, materials, the ball) and the compiled geometry
+        self.name = spec.get("name", "")
+        self.size = spec.get("size", [1000, 1000])
+        self.colors = spec.get("colors", {})
+        self.materials = spec.get("materials", {})
+        self.material_pairs = spec.get("material_pairs", {})
+        self.ball = spec.get("ball", {})
+        self.header = header
+        self.arrays = arrays
+
+    # A color is either a name from the table's colors or an [r, g, b] list
+    def color(self, value):
+        if isinstance(value, str):
+            return list(self.colors[value])
+        return list(value)
+
+    # Make the physics objects from the compiled arrays, without redoing any of the geometry
+    def build(self):
+        arrays = self.arrays
+        pos = arrays["pos"].tolist()
+        angle = arrays["angle"].tolist()
+        radius = arrays["radius"].tolist()
+        wall_points = arrays["wall_points"].tolist()
+        start = arrays["vertex_start"].tolist()
+        count = arrays["vertex_count"].tolist()
+        aabb = arrays["aabb"].tolist()
+        offsets = arrays["offsets"].tolist()
+        local_normals = arrays["local_normals"].tolist()
+        points = arrays["points"].tolist()
+        normals = arrays["normals"].tolist()
+
+        groups = {}
+        one_way_gate = None
+        material_index = {name: i for i, name in enumerate(material_names(self.materials))}
+        for i, shape in enumerate(self.header["shapes"]):
+            kind = shape["kind"]
+            if kind == "circle":
+                obj = Circle(radius=radius[i], pos=Vector2(pos[i]), color=shape["color"], width=shape["line_width"])
+            elif kind == "wall":
+                x1, y1, x2, y2 = wall_points[i]
+                obj = Wall(point1=Vector2(x1, y1), point2=Vector2(x2, y2), reverse=shape["reverse"],
+                           color=shape["color"], width=shape["line_width"])
+            else:
+                vertices = slice(start[i], start[i] + count[i])
+                obj = Polygon.from_geometry(offsets[vertices], local_normals[vertices], points[vertices], normals[vertices],
+                                            tuple(aabb[i]), color=shape["color"], width=shape["line_width"],
+                                            normals_length=shape["normals_length"], pos=Vector2(pos[i]), angle=angle[i],
+                                            body_type=shape["body_type"])
+            obj.material = material_index[shape["material"]]
+            groups.setdefault(shape["group"], []).append(obj)
+            if shape.get("one_way"):
+                one_way_gate = obj
+
+        pieces = TablePieces(groups)
+        pieces.one_way_gate = one_way_gate
+        pieces.wall_tree = BVH.from_flat(pieces.walls, unpack_flat(arrays, "walls_bvh"))
+        pieces.bumper_tree = BVH.from_flat(pieces.bumpers, unpack_flat(arrays, "bumpers_bvh"))
+        pieces.wall_edges = unpack_edges(arrays, "walls_edges", pieces.walls)
+        pieces.bumper_edges = unpack_edges(arrays, "bumpers_edges", pieces.bumpers)
+        return pieces
+
+## Compiling
+# Table file -> (header, arrays) for the cache
+def compile_table(spec):
+    table = Table(spec, None, None)
+    shapes = []
+    objects = []
+    groups = {}
+    names = material_names(table.materials)
+    for group, entry in table_entries(spec):
+        material = entry.get("material", group_materials.get(group, "default"))
+        if material not in names:
+            raise ValueError(f"unknown material {material!r}, the table has {', '.join(names)}")
+        for obj in build_piece(entry, table):
+            shape = {"group": group, "kind": obj.contact_type.lower(), "color": list(obj.color),
+                     "line_width": obj.width, "body_type": obj.body_type, "material": material}
+            if shape["kind"] == "polygon":
+                shape["normals_length"] = obj.normals_length
+            if shape["kind"] == "wall":
+                # Wall works its normal out from the two points, reversed or not
+                shape["reverse"] = entry.get("reverse", False)
+            if entry.get("one_way"):
+                shape["one_way"] = True
+            shapes.append(shape)
+            objects.append(obj)
+            groups.setdefault(group, []).append(obj)
+
+    count = len(objects)
+    arrays = {
+        "pos": np.array([(obj.pos.x, obj.pos.y) for obj in objects], dtype=float).reshape(count, 2),
+        "angle": np.array([obj.angle for obj in objects], dtype=float),
+        "radius": np.array([getattr(obj, "radius", 0) for obj in objects], dtype=float),
+        "aabb": np.array([obj.aabb() if obj.aabb() is not None else (np.nan,) * 4 for obj in objects], dtype=float).reshape(count, 4),
+        "wall_points": np.array([(obj.point1.x, obj.point1.y, obj.point2.x, obj.point2.y) if obj.contact_type == "Wall"
+                                 else (0, 0, 0, 0) for obj in objects], dtype=float).reshape(count, 4),
+    }
+
+    # Every polygon's vertices, packed end to end
+    vertex_count = [len(obj.points) if obj.contact_type == "Polygon" else 0 for obj in objects]
+    arrays["vertex_count"] = np.array(vertex_count, dtype=np.int64)
+    arrays["vertex_start"] = np.cumsum([0] + vertex_count[:-1]).astype(np.int64)
+    polygons = [obj for obj in objects if obj.contact_type == "Polygon"]
+    for name in ("offsets", "local_normals", "points", "normals"):
+        arrays[name] = np.array([(v.x, v.y) for obj in polygons for v in getattr(obj, name)], dtype=float).reshape(-1, 2)
+
+    # The broadphase trees and the batched contact buffers for the fixed walls and bumpers
+    for group in ("walls", "bumpers"):
+        items = groups.get(group, [])
+        pack_flat(arrays, group + "_bvh", BVH(items).flat())
+        pack_edges(arrays, group + "_edges", EdgeBuffer([obj for obj in items if obj.contact_type == "Polygon"]), items)
+
+    header = {"version": cache_version, "shapes": shapes}
+    return header, arrays
+
+def pack_flat(arrays, prefix, flat):
+    arrays[prefix + "_boxes"] = np.array(flat["boxes"], dtype=float).reshape(-1, 4)
+    for name in ("left", "right", "first", "count", "order", "unbounded"):
+        arrays[prefix + "_" + name] = np.array(flat[name], dtype=np.int64)
+
+def unpack_flat(arrays, prefix):
+    flat = {name: arrays[prefix + "_" + name].tolist() for name in ("left", "right", "first", "count", "order", "unbounded")}
+    flat["boxes"] = [tuple(box) for box in arrays[prefix + "_boxes"].tolist()]
+    return flat
+
+def pack_edges(arrays, prefix, edges, items):
+    index = {id(obj): i for i, obj in enumerate(items)}
+    arrays[prefix + "_polygons"] = np.array([index[id(polygon)] for polygon in edges.polygons], dtype=np.int64)
+    for name in ("count", "start", "owner", "prev"):
+        arrays[prefix + "_" + name] = getattr(edges, name).astype(np.int64)
+    arrays[prefix + "_points"] = edges.points
+    arrays[prefix + "_normals"] = edges.normals
+
+def unpack_edges(arrays, prefix, items):
+    polygons = [items[i] for i in arrays[prefix + "_polygons"].tolist()]
+    return EdgeBuffer.from_arrays(polygons, *(arrays[prefix + "_" + name] for name in
+                                              ("count", "start", "owner", "prev", "points", "normals")))
+
+## Cache file
+# Layout: magic, header length (8 bytes), json header, then every array aligned to 64 bytes.
+# The header lists each array's dtype, shape and offset, so the whole file is mapped once and sliced up.
+def write_cache(path, header, arrays):
+    header = dict(header)
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // cache_alignment) * cache_alignment
+    header["arrays"] = layout
+    text = json.dumps(header).encode()
+    data_start = -(-(len(cache_magic) + 8 + len(text)) // cache_alignment) * cache_alignment
+    header_bytes = cache_magic + len(text).to_bytes(8, "little") + text
+    header_bytes += b"\0" * (data_start - len(header_bytes))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temp file of its own, so two processes building the same table at once can't write into each other's
+    descriptor, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(header_bytes)
+            for name, array in arrays.items():
+                file.seek(data_start + layout[name]["offset"])
+                file.write(array.tobytes())
+            file.truncate(data_start + offset)
+        # Only ever a whole cache file under the real name
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+def read_cache(path):
+    # Copy-on-write, so nothing can change the file but the arrays still behave like normal ones
+    data = np.memmap(path, dtype=np.uint8, mode="c")
+    if bytes(data[:len(cache_magic)]) != cache_magic:
+        raise ValueError(f"{path} is not a table cache")
+    length = int.from_bytes(bytes(data[len(cache_magic):len(cache_magic) + 8]), "little")
+    text_start = len(cache_magic) + 8
+    header = json.loads(bytes(data[text_start:text_start + length]))
+    data_start = -(-(text_start + length) // cache_alignment) * cache_alignment
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        size = int(np.prod(info["shape"])) * dtype.itemsize
+        start = data_start + info["offset"]
+        if start + size > len(data):
+            raise ValueError(f"{path} is cut short")
+        arrays[name] = data[start:start + size].view(dtype).reshape(info["shape"])
+    return header, arrays
+
+def cache_path(path, source):
+    digest = hashlib.sha256(source + str(cache_version).encode()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{digest}.bin")
+
+# Load a table file, compiling it into the cache first if this version of it hasn't been seen
+# (or the cache file for it can't be used)
+def load_table(path=default_table):
+    with open(path, "rb") as file:
+        source = file.read()
+    spec = json.loads(source)
+    cached = cache_path(path, source)
+    if os.path.exists(cached):
+        try:
+            header, arrays = read_cache(cached)
+            return Table(spec, header, arrays)
+        except (OSError, ValueError, KeyError):
+            # Cut short, not a cache at all, or missing something | built again and written over below
+            pass
+    header, arrays = compile_table(spec)
+    try:
+        write_cache(cached, header, arrays)
+    except OSError:
+        # Read-only install, just use what was compiled
+        return Table(spec, header, arrays)
+    header, arrays = read_cache(cached)
+    return Table(spec, header, arrays)
@@ -0,0 +1,169 @@
+# Game timers: one-shot and repeating callbacks on simulation time, for light shows, ball saves, kickback
+# windows, mode timers...
+#
+# Time is counted in whole ticks (ticks_per_second of them), worked out from the total of every dt handed to
+# advance(). So timers fire on exactly the same step however the time was split into steps, and a timer due
+# at a tick always fires at that tick, never a float's worth early or late.
+#
+# The timers sit in a hierarchical wheel: 4 levels of 256 slots. Level 0 has a slot for each of the next 256
+# ticks, level 1 a slot for each of the next 256 blocks of 256 ticks, and so on. Every 256 ticks the next
+# slot of the level above is emptied back down into the levels below (a "cascade"). Adding or cancelling a
+# timer is O(1), and each level keeps a bitmap of its slots that have timers in them, so advance jumps
+# straight to the next tick with something in its slot (or the next cascade) instead of going through the
+# empty ones. A step only touches the timers that are due (plus one cascade every 256 ticks it crosses),
+# however many are waiting and however long the step is.
+#
+# Callbacks are named instead of held directly (add them to handlers), so the timers waiting can be saved
+# with get_state and put back exactly with set_state (replay.py). Timers due on the same tick fire in the
+# order they were made.
+
+ticks_per_second = 1000
+
+level_bits = 8
+levels = 4
+slot_mask = (1 << level_bits) - 1
+# Anything further off than this just waits in the top level until it comes round
+max_delay = (1 << (level_bits * levels)) - 1
+
+class Timer:
+    def __init__(self, id, at, period, name, args):
+        self.id = id
+        # Tick it is due on
+        self.at = at
+        # Ticks between repeats, 0 for a one-shot
+        self.period = period
+        self.name = name
+        self.args = args
+
+class TimerWheel:
+    def __init__(self, handlers=None):
+        # name -> function called with the timer's args
+        self.handlers = dict(handlers or {})
+        # Seconds and ticks advanced so far | now is the last tick done
+        self.time = 0.0
+        self.now = 0
+        self.next_id = 0
+        # Live timers by id | a cancelled one is just dropped from here and skipped when its slot comes up
+        self.timers = {}
+        self.wheel = [[[] for i in range(1 << level_bits)] for level in range(levels)]
+        # Bit i of a level's bitmap is set while slot i has anything in it (cancelled timers included)
+        self.occupied = [0] * levels
+
+    def ticks(self, seconds):
+        return int(round(seconds * ticks_per_second))
+
+    # Call handler name with args once, seconds from now | returns the timer's id, for cancel
+    def after(self, seconds, name, *args):
+        return self.schedule(self.ticks(seconds), 0, name, args)
+
+    # Call handler name with args every seconds, the first time seconds from now (or after first seconds)
+    def every(self, seconds, name, *args, first=None):
+        period = max(self.ticks(seconds), 1)
+        return self.schedule(period if first is None else self.ticks(first), period, name, args)
+
+    def cancel(self, id):
+        self.timers.pop(id, None)
+
+    def active(self, id):
+        return id in self.timers
+
+    # Seconds until a timer is next due
+    def remaining(self, id):
+        return (self.timers[id].at - self.now) / ticks_per_second
+
+    def schedule(self, delay, period, name, args):
+        # Never due before the next tick, the one being run may already have been emptied
+        timer = Timer(self.next_id, self.now + min(max(delay, 1), max_delay), period, name, list(args))
+        self.next_id += 1
+        self.timers[timer.id] = timer
+        self.insert(timer, self.now + 1)
+        return timer.id
+
+    # Put a timer in the slot for its tick, counting from base (the next tick that will be run)
+    def insert(self, timer, base):
+        delay = timer.at - base
+        level = 0
+        while level < levels - 1 and delay >> (level_bits * (level + 1)):
+            level += 1
+        slot = (timer.at >> (level_bits * level)) & slot_mask
+        self.wheel[level][slot].append(timer)
+        self.occupied[level] |= 1 << slot
+
+    # Move on by dt seconds and fire everything that came due | returns how many fired
+    def advance(self, dt):
+        self.time += dt
+        # (the small nudge stops a total that should be a whole tick from landing just short of it)
+        target = int(self.time * ticks_per_second + 1e-6)
+        fired = 0
+        while self.now < target:
+            if not self.timers:
+                # Nothing waiting, so nothing can be due | skip to the end
+                # (cancelled timers left in the slots are skipped whenever they come up, wherever they are)
+                self.now = target
+                break
+            # The next tick worth stopping at | a cascade, or the next level 0 slot with timers in it up to the
+            # end of this block of 256 (a slot before this one holds the next block's timers), or else the
+            # next cascade
+            tick = self.now + 1
+            slot = tick & slot_mask
+            if slot:
+                ahead = self.occupied[0] >> slot
+                if ahead:
+                    tick += (ahead & -ahead).bit_length() - 1
+                else:
+                    tick = (tick + slot_mask) & ~slot_mask
+            if tick > target:
+                self.now = target
+                break
+            self.now = tick
+            if not tick & slot_mask:
+                self.cascade(tick)
+            slot = tick & slot_mask
+            due = self.wheel[0][slot]
+            if not due:
+                continue
+            self.wheel[0][slot] = []
+            self.occupied[0] &= ~(1 << slot)
+            for timer in sorted(due, key=lambda timer: timer.id):
+                # Cancelled, or cancelled by a callback earlier in this tick
+                if self.timers.get(timer.id) is not timer:
+                    continue
+                if timer.period:
+                    timer.at += timer.period
+                    self.insert(timer, tick + 1)
+                else:
+                    del self.timers[timer.id]
+                self.handlers[timer.name](*timer.args)
+                fired += 1
+        return fired
+
+    # Empty the next slot of each level above into the ones below, as far up as the tick has rolled over
+    def cascade(self, tick):
+        for level in range(1, levels):
+            slot = (tick >> (level_bits * level)) & slot_mask
+            timers = self.wheel[level][slot]
+            self.wheel[level][slot] = []
+            self.occupied[level] &= ~(1 << slot)
+            for timer in timers:
+                if self.timers.get(timer.id) is timer:
+                    self.insert(timer, tick)
+            if slot:
+                break
+
+    ## Saving and restoring
+    def get_state(self):
+        return {"time": self.time, "now": self.now, "next_id": self.next_id,
+                "timers": [[timer.id, timer.at, timer.period, timer.name, list(timer.args)]
+                           for timer in sorted(self.timers.values(), key=lambda timer: timer.id)]}
+
+    def set_state(self, state):
+        self.time = state["time"]
+        self.now = state["now"]
+        self.next_id = state["next_id"]
+        self.timers = {}
+        self.wheel = [[[] for i in range(1 << level_bits)] for level in range(levels)]
+        self.occupied = [0] * levels
+        for id, at, period, name, args in state["timers"]:
+            timer = Timer(id, at, period, name, list(args))
+            self.timers[id] = timer
+            self.insert(timer, self.now + 1)
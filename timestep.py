@@ -0,0 +1,69 @@
+from vector import Vector2
+
+# Fixed physics steps, decoupled from however long each rendered frame took.
+#
+# Every frame the real time that passed goes into an accumulator, and the world is stepped with the same
+# fixed dt for as many whole steps as fit. Whatever is left over (less than one step) is used to draw the
+# moving bodies part of the way between the last two steps, so motion stays smooth at any physics rate.
+
+class FixedTimestep:
+    def __init__(self, rate=240, max_steps=8):
+        self.rate = rate
+        self.dt = 1 / rate
+        # Most steps run for one frame. After a long hitch the extra time is dropped instead of running more and
+        # more steps each frame trying to catch up (the "spiral of death").
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    # How many steps to run for a frame that took frame_time seconds
+    def steps_due(self, frame_time):
+        self.accumulator += frame_time
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = steps * self.dt
+        self.accumulator -= steps * self.dt
+        return steps
+
+    # How far (0 to 1) the frame is between the last step and the next one
+    @property
+    def alpha(self):
+        return min(max(self.accumulator / self.dt, 0.0), 1.0)
+
+# Remembers where the moving bodies were before the latest step, so they can be drawn in between
+class PoseInterpolator:
+    def __init__(self, bodies):
+        # bodies is a list (or a function returning a list, if bodies come and go) of things to smooth out
+        self.bodies = bodies
+        self.previous = {}
+        self.current = {}
+
+    def body_list(self):
+        return self.bodies() if callable(self.bodies) else self.bodies
+
+    # Call right before each step
+    def capture(self):
+        self.previous = {id(body): (body.pos.x, body.pos.y, body.angle) for body in self.body_list()}
+
+    # Put every body at its in-between pose for drawing. Call restore() once drawing is done.
+    def apply(self, alpha):
+        self.current = {}
+        for body in self.body_list():
+            before = self.previous.get(id(body))
+            if before is None:
+                continue
+            now = (body.pos.x, body.pos.y, body.angle)
+            self.current[id(body)] = (body, now)
+            x, y, angle = (b + (n - b) * alpha for b, n in zip(before, now))
+            set_pose(body, x, y, angle)
+
+    def restore(self):
+        for body, (x, y, angle) in self.current.values():
+            set_pose(body, x, y, angle)
+        self.current = {}
+
+def set_pose(body, x, y, angle):
+    body.pos = Vector2(x, y)
+    body.angle = angle
+    if hasattr(body, "update_points"):
+        body.update_points()
@@ -0,0 +1,201 @@
+import math
+
+# A small 2D vector that works like pygame.math.Vector2 for everything the physics uses.
+# Having it here means the physics (and anything that only steps the World) never has to import pygame,
+# which starts up SDL and the rest of it before a single ball can move.
+#
+# Same rules as pygame's: v * w is the dot product, v * 2 scales, == allows for a tiny difference, and
+# rotations by an exact multiple of 90 degrees give exact results. Anything taking an (x, y) sequence
+# (pygame.draw, numpy) takes one of these too.
+
+# Two vectors closer than this in both x and y are equal
+epsilon = 1e-6
+
+class Vector2:
+    __slots__ = ("x", "y")
+
+    # Vector2(), Vector2(x, y), Vector2((x, y)) or Vector2(v) for a copy | Vector2(3) is (3, 3)
+    def __init__(self, x=0.0, y=None):
+        if y is None:
+            if x.__class__ is Vector2:
+                x, y = x.x, x.y
+            elif isinstance(x, (int, float)):
+                y = x
+            else:
+                x, y = x[0], x[1]
+        self.x = float(x)
+        self.y = float(y)
+
+    def __repr__(self):
+        return f"Vector2({self.x}, {self.y})"
+
+    ## Sequence | so it can be unpacked, indexed, and handed to pygame or numpy as a point
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __getitem__(self, i):
+        if i == 0:
+            return self.x
+        if i == 1:
+            return self.y
+        return (self.x, self.y)[i]
+
+    def __setitem__(self, i, value):
+        if i == 0 or i == -2:
+            self.x = float(value)
+        elif i == 1 or i == -1:
+            self.y = float(value)
+        else:
+            raise IndexError("Vector2 index out of range")
+
+    def __eq__(self, other):
+        try:
+            ox, oy = other[0], other[1]
+        except (TypeError, IndexError, KeyError):
+            return NotImplemented
+        return abs(self.x - ox) < epsilon and abs(self.y - oy) < epsilon
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __bool__(self):
+        return self.x != 0 or self.y != 0
+
+    ## Arithmetic | the other side can be any (x, y) sequence, another Vector2 just takes the short way
+    def __add__(self, other):
+        if other.__class__ is Vector2:
+            return Vector2(self.x + other.x, self.y + other.y)
+        return Vector2(self.x + other[0], self.y + other[1])
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if other.__class__ is Vector2:
+            return Vector2(self.x - other.x, self.y - other.y)
+        return Vector2(self.x - other[0], self.y - other[1])
+
+    def __rsub__(self, other):
+        return Vector2(other[0] - self.x, other[1] - self.y)
+
+    # Vector * vector is the dot product, vector * number scales (isinstance, so a particle's RowVector is a
+    # vector too, see physics_objects.py)
+    def __mul__(self, other):
+        if isinstance(other, Vector2):
+            return self.x * other.x + self.y * other.y
+        return Vector2(self.x * other, self.y * other)
+
+    __rmul__ = __mul__
+
+    # Multiplies by 1/other like pygame does, so the results match it to the last bit
+    def __truediv__(self, other):
+        inverse = 1.0 / other
+        return Vector2(self.x * inverse, self.y * inverse)
+
+    def __neg__(self):
+        return Vector2(-self.x, -self.y)
+
+    def __pos__(self):
+        return Vector2(self.x, self.y)
+
+    # The in-place versions change the vector itself, like pygame's do, so every name for it sees the change
+    def __iadd__(self, other):
+        if other.__class__ is Vector2:
+            self.x += other.x
+            self.y += other.y
+        else:
+            self.x += other[0]
+            self.y += other[1]
+        return self
+
+    def __isub__(self, other):
+        if other.__class__ is Vector2:
+            self.x -= other.x
+            self.y -= other.y
+        else:
+            self.x -= other[0]
+            self.y -= other[1]
+        return self
+
+    def __imul__(self, other):
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __itruediv__(self, other):
+        inverse = 1.0 / other
+        self.x *= inverse
+        self.y *= inverse
+        return self
+
+    ## Vector math
+    def copy(self):
+        return Vector2(self.x, self.y)
+
+    def dot(self, other):
+        if other.__class__ is Vector2:
+            return self.x * other.x + self.y * other.y
+        return self.x * other[0] + self.y * other[1]
+
+    def magnitude(self):
+        return math.sqrt(self.x * self.x + self.y * self.y)
+
+    length = magnitude
+
+    def magnitude_squared(self):
+        return self.x * self.x + self.y * self.y
+
+    length_squared = magnitude_squared
+
+    def normalize(self):
+        length = math.sqrt(self.x * self.x + self.y * self.y)
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        return Vector2(self.x / length, self.y / length)
+
+    # Counterclockwise (on screen, clockwise) by degrees
+    def rotate(self, degrees):
+        return self.rotate_rad(degrees * math.pi / 180.0)
+
+    def rotate_rad(self, angle):
+        angle = math.fmod(angle, 2 * math.pi)
+        if angle < 0:
+            angle += 2 * math.pi
+        # Quarter turns are done exactly, so a box rotated by 90 degrees stays a clean box
+        if math.fmod(angle + epsilon, math.pi / 2) < 2 * epsilon:
+            quarter = int((angle + epsilon) / (math.pi / 2)) % 4
+            if quarter == 0:
+                return Vector2(self.x, self.y)
+            if quarter == 1:
+                return Vector2(-self.y, self.x)
+            if quarter == 2:
+                return Vector2(-self.x, -self.y)
+            return Vector2(self.y, -self.x)
+        s = math.sin(angle)
+        c = math.cos(angle)
+        return Vector2(c * self.x - s * self.y, s * self.x + c * self.y)
+
+    def distance_to(self, other):
+        dx = self.x - other[0]
+        dy = self.y - other[1]
+        return math.sqrt(dx * dx + dy * dy)
+
+# (cos, sin) of angle (radians) exactly as rotate_rad works them out, quarter turns included, for rotating lots
+# of points by one angle without a Vector2 for each (see narrowphase.VertexBuffer)
+def rotation(angle):
+    angle = math.fmod(angle, 2 * math.pi)
+    if angle < 0:
+        angle += 2 * math.pi
+    if math.fmod(angle + epsilon, math.pi / 2) < 2 * epsilon:
+        return quarter_turns[int((angle + epsilon) / (math.pi / 2)) % 4]
+    return math.cos(angle), math.sin(angle)
+
+quarter_turns = ((1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0))
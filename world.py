@@ -0,0 +1,738 @@
+from itertools import combinations
+import numpy as np
+from vector import Vector2
+from physics_objects import Circle, STATIC
+from contact import resolve_contacts, ContactManager, bumper_rebound_speed
+from forces import Gravity
+from bvh import swept_box, boxes_overlap, union_box
+from particle_system import ParticleSystem
+from narrowphase import circle_polygon_contacts, VertexBuffer
+from ccd import time_of_impact
+from sensor import Sensor, Sensors
+from timers import TimerWheel
+from lamps import LampSequence
+from materials import MaterialTable
+from profiler import null_profiler
+from table import load_table, default_table, convert_degree
+
+# The World owns the table and everything on it, and advances it with step(dt, inputs).
+# It never touches the display, so it can be stepped as fast as the CPU allows (CI, batch jobs, servers).
+# pinball.py is just a renderer and input driver sitting on top of it.
+
+# Colors
+bg_color1 = [0, 0, 0]
+bg_color2 = [80, 200, 80]
+
+wall_color1 = [120, 20, 20] # Red
+wall_color2 = [255,127,0] # Orange
+wall_color3 = [107, 53, 41]
+
+obj_color1 = [20, 120, 120]
+obj_color2 = [120, 120, 0]
+
+score_color1=[255, 80, 80] # Pink
+score_color2=[20,150,20] # Green
+score_color3=[20, 13, 226] # Blue
+score_color4=[255,255,255] # White
+
+disabled_pad_color = [100, 0, 0]
+# A score pad switches off when it is hit and comes back on this many seconds later
+# (default for tables that don't set a cooldown in their sensor material)
+pad_cooldown = 3
+
+ball_color = [255, 255, 255]
+ball_color2 = [5, 255, 255]
+
+# Board size
+# Original width - 1000, width - 800
+width = 1000
+height = 1000
+
+# Variables
+# 3px = 1cm
+# Gravity set to 490 rather than the normal 980
+
+# Board setup/functionality variables
+safezone_offset = 30
+status_offset = height/5
+
+play_width = width - safezone_offset
+play_height = height - safezone_offset
+play_height_top = height - status_offset
+half_board_height = (height+status_offset)/2
+play_area_center = Vector2(width/2, half_board_height)
+# play_width/height were intended to only be used after wall generation functions
+
+plunger_lane_width = safezone_offset/2
+plunger_lane_center = width - (safezone_offset * 1.5)
+
+plunger_y_max = height - (height * 0.3)
+plunger_y_min = height - (height * 0.1)
+plunger_accel = 50
+
+# The plunger and flipper accelerations are added once per step and were tuned at 60 steps a second.
+# They get scaled by dt / tuning_dt so they feel the same at any physics rate.
+tuning_dt = 1/60
+
+flipper_ang_accel = 0.7
+flipper_ang_decel = 0.7
+flipper_angle = 25
+flipper_max_angle = 30
+
+# Extra room around a ball's swept box when asking the BVH for nearby walls
+contact_margin = 2
+
+# Bounciness of the walls and of the balls off each other
+# (defaults for tables that don't set them in their materials)
+wall_restitution = 0.3
+ball_restitution = 0.1
+
+# Continuous collision detection
+# Balls moving more than ccd_threshold * radius in a step are swept along their path instead of just moved
+ccd_threshold = 0.5
+# Most wall hits that get handled for one ball in one step
+ccd_iterations = 3
+# How far off a surface a swept ball is left, so it doesn't find the same hit again
+ccd_skin = 0.01
+
+# Bumpers
+# Adjusts the distance that the ball will rebound off of all bumpers
+rebound_multiplier = 1
+
+# Downward pull on the balls, px/s^2 (see the note on gravity at the top)
+gravity_acc = 490
+
+# Tuning values a World can be made with instead of the defaults above | World(params={"gravity": 600}),
+# see sweep.py. Restitution and rebound given here win over the table's material pairs.
+tunables = ("plunger_accel", "flipper_ang_accel", "flipper_ang_decel", "rebound_multiplier", "gravity",
+            "wall_restitution", "ball_restitution")
+# The material pair value each of those sets | the pair, not the material, or a bouncier ball would also
+# bounce harder off walls and bumpers (see materials.py)
+param_pairs = {"wall_restitution": ("ball/wall", "restitution"), "ball_restitution": ("ball/ball", "restitution"),
+               "rebound_multiplier": ("ball/bumper", "rebound")}
+
+# The materials the table's groups and the balls are made of, for tables that don't set them (see materials.py)
+material_defaults = {"wall": {"restitution": wall_restitution}, "ball": {"restitution": ball_restitution},
+                     "bumper": {"rebound": rebound_multiplier, "score": 100},
+                     "sensor": {"score": 100, "cooldown": pad_cooldown}}
+
+# A ball that stays slower than both of these for time_to_sleep seconds goes to sleep until something wakes it
+sleep_linear_speed = 12     # px/s
+sleep_angular_speed = 0.5   # rad/s
+time_to_sleep = 0.5
+
+# The lights come on white one at a time, a second apart, then all go back to blue a second after the last one
+def light_chase(count, seconds=1):
+    frames = [(seconds, [(i, score_color3) for i in range(count)])]
+    frames += [(seconds, [(i, score_color4)]) for i in range(count)]
+    return frames
+
+# Button states for a single step. Whoever drives the world (keyboard, replay, bot) fills one of these in.
+class Inputs:
+    def __init__(self, plunger=False, left_flipper=False, right_flipper=False):
+        self.plunger = plunger
+        self.left_flipper = left_flipper
+        self.right_flipper = right_flipper
+
+class World:
+    def __init__(self, table=default_table, params=None):
+        params = dict(params or {})
+        unknown = sorted(set(params) - set(tunables))
+        if unknown:
+            raise ValueError(f"unknown tuning values {unknown}, these can be set: {', '.join(tunables)}")
+        self.params = params
+
+        # Game Mechanic Variables
+        self.score = 0
+        self.balls_left = 2
+        self.no_bonus_ball = True
+        self.game_over = False
+
+        # Game timers and light shows, run on simulation time
+        self.timers = TimerWheel()
+
+        # OBJECTS
+        self.objects = []
+        self.walls = []
+        self.bumpers = []
+        self.bonus_zones = []
+        self.balls = []
+        # Pairs of balls that touched this step | balls that touch sleep and wake together
+        self.touching = []
+
+        # Balls live in here so they can all be integrated in one go
+        self.particles = ParticleSystem()
+        # Contacts are kept from step to step while a ball stays near something
+        self.contacts = ContactManager()
+        # Swap in a profiler.Profiler to time each phase of the step
+        self.profiler = null_profiler
+
+        # Anything that will be handled by the decor list
+        self.gfx_objs = []
+        self.flashing_gfx = []
+
+        # The table itself comes from a table file (see table.py and tables/)
+        self.table_path = table
+        self.table = load_table(table)
+        pieces = self.table.build()
+        self.walls.extend(pieces.walls)
+        self.bumpers.extend(pieces.bumpers)
+        self.bonus_zones.extend(pieces.sensors)
+        self.objects.extend(self.bumpers)
+        self.objects.extend(self.bonus_zones)
+        # Decor is rendered on the layer ABOVE the game board, lights are decor that changes color
+        self.gfx_objs.extend(pieces.decor)
+        self.flashing_gfx.extend(pieces.lights)
+        self.gfx_objs.extend(self.flashing_gfx)
+        self.light_chase = LampSequence(self.timers, "light_chase", self.flashing_gfx, light_chase(len(self.flashing_gfx)))
+        self.light_chase.start()
+        # The ball can't be stopped by this gate from underneath, see first_impact
+        self.one_way_gate = pieces.one_way_gate
+
+        # What the table is made of | every shape has its material, and every contact goes by the pair (materials.py)
+        overrides = {}
+        for name, (pair, field) in param_pairs.items():
+            if name in params:
+                overrides.setdefault(pair, {})[field] = params[name]
+        self.materials = MaterialTable(self.table.materials, self.table.material_pairs, material_defaults, overrides)
+        self.ball_material = self.materials.lookup("ball")
+        # What a ball gets off each group's material, for whatever treats a whole group the same (ensemble.py)
+        self.wall_restitution = self.materials.named_pair("ball", "wall")[0]
+        self.ball_restitution = self.materials.named_pair("ball", "ball")[0]
+        self.bumper_rebound = self.materials.named_pair("ball", "bumper")[2] / bumper_rebound_speed
+        self.bumper_score = self.materials.material("bumper").score
+        self.sensor_score = self.materials.material("sensor").score
+        self.sensor_cooldown = self.materials.material("sensor").get("cooldown", pad_cooldown)
+
+        # Controls
+        self.plunger_accel = params.get("plunger_accel", plunger_accel)
+        self.flipper_ang_accel = params.get("flipper_ang_accel", flipper_ang_accel)
+        self.flipper_ang_decel = params.get("flipper_ang_decel", flipper_ang_decel)
+
+        # paddles
+        self.left_flipper = pieces.left_flipper
+        self.left_flipper_ball = pieces.left_flipper_pivot
+        self.right_flipper = pieces.right_flipper
+        self.right_flipper_ball = pieces.right_flipper_pivot
+
+        # plunger
+        self.plunger = pieces.plunger
+
+        # ball
+        ball = self.table.ball
+        self.ball_radius = ball.get("radius", 9)
+        self.ball_reset_pos = Vector2(ball.get("reset", (play_width-safezone_offset * 0.5, height-400)))
+        self.multiball_pos = Vector2(ball.get("multiball", (width/2+100, 400)))
+        self.ball_in_play = Circle(mass=1, pos=Vector2(ball.get("start", (width-50, height-500))), radius=self.ball_radius, color=ball_color, width=1)
+        self.ball_in_play.material = self.ball_material
+        self.ball_in_play2 = None
+
+        # Create some gfx for the ball
+        self.ball_arm = Circle(pos=self.ball_in_play.pos, radius=6, color=obj_color2)
+
+        self.gfx_objs.append(self.ball_arm)
+        self.particles.add(self.ball_in_play)
+        self.balls.append(self.ball_in_play)
+        self.reset_ball()
+
+        # Create a way to save the ball by teleporting it to a set point on the board
+        self.save_ball_tele_entr = pieces.teleporter_entrance
+        self.save_ball_tele_exit = pieces.teleporter_exit
+        self.objects.append(self.save_ball_tele_entr)
+        self.objects.append(self.save_ball_tele_exit)
+
+        # Score pads and the teleporter entrance only notice balls, they get their own tree and enter/exit events
+        self.pads = [Sensor(obj, depth=2, cooldown=self.materials.of(obj).get("cooldown", pad_cooldown),
+                            colors=(obj.color, disabled_pad_color), on_enter=self.hit_pad) for obj in self.bonus_zones]
+        # The teleporter stays off (no cooldown) until the ball drains
+        self.teleporter = Sensor(self.save_ball_tele_entr, depth=2, colors=(self.save_ball_tele_entr.color, score_color1),
+                                 on_enter=self.use_teleporter, on_stay=self.use_teleporter)
+        self.sensors = Sensors(self.pads + [self.teleporter], self.timers)
+
+        # Everything in walls/bumpers up to here is fixed table geometry, so the trees come compiled with the table
+        self.wall_tree = pieces.wall_tree
+        self.bumper_tree = pieces.bumper_tree
+        # All of the static polygon edges packed together, for the batched circle-polygon test
+        self.wall_edges = pieces.wall_edges
+        self.bumper_edges = pieces.bumper_edges
+        # These move, so they are always tested
+        self.moving_walls = [self.plunger, self.right_flipper, self.left_flipper]
+        # and get posed together, in one go, after they move
+        self.moving_edges = VertexBuffer(self.moving_walls)
+
+        # Add walls and ball interactions to the wall array
+        self.walls.append(self.plunger)
+        self.walls.append(self.right_flipper)
+        self.walls.append(self.left_flipper)
+
+        # Add all previous objects to the objects array so the ball can interact properly
+        self.objects.append(self.plunger)
+        self.objects.append(self.right_flipper)
+        self.objects.append(self.right_flipper_ball)
+        self.objects.append(self.left_flipper)
+        self.objects.append(self.left_flipper_ball)
+        self.objects.append(self.ball_in_play)
+
+        # Setup forces
+        self.gravity = Gravity(system=self.particles, acc=(0, params.get("gravity", gravity_acc)))
+
+    def reset_ball(self):
+        for obj in self.balls:
+            obj.pos = Vector2(self.ball_reset_pos)
+            obj.vel = Vector2(0,0)
+            self.wake(obj)
+
+    # DEBUG | drop the ball wherever the mouse is
+    def place_ball(self, pos):
+        self.ball_in_play.pos = Vector2(pos)
+        self.ball_in_play.vel = Vector2(0,0)
+        self.wake(self.ball_in_play)
+
+    # Put another ball on the table
+    def add_ball(self, pos, vel=(0,0), color=ball_color, width=1):
+        ball = Circle(mass=1, pos=Vector2(pos), vel=Vector2(vel), radius=self.ball_radius, color=color, width=width)
+        ball.material = self.ball_material
+        self.particles.add(ball)
+        self.balls.append(ball)
+        self.objects.append(ball)
+        return ball
+
+    # Take a ball off the table
+    def remove_ball(self, ball):
+        self.particles.remove(ball)
+        self.balls.remove(ball)
+        self.objects.remove(ball)
+        self.touching = [pair for pair in self.touching if ball not in pair]
+        self.sensors.forget(ball)
+        if ball is self.ball_in_play2:
+            self.ball_in_play2 = None
+
+    ## Sensors
+    def hit_pad(self, pad, ball):
+        if pad.enabled:
+            self.score += self.materials.of(pad.shape).score
+            pad.fire()
+
+    # Only the first ball can use it, once the score is up to 1000, and then not again until that ball drains
+    # (on_stay as well, so a ball already sat on it when the score gets there still goes)
+    def use_teleporter(self, teleporter, ball):
+        if ball is self.ball_in_play and teleporter.enabled and self.score >= 1000:
+            ball.pos = Vector2(self.save_ball_tele_exit.pos)
+            ball.vel = Vector2(ball.vel.x, 0)
+            teleporter.fire()
+
+    ## Saving and restoring
+    # Everything a contact can be between, in an order that only depends on how many balls there are
+    def bodies(self):
+        seen = set()
+        bodies = []
+        for obj in self.walls + self.objects:
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                bodies.append(obj)
+        return bodies
+
+    # Everything that changes while playing, as plain json-able values. Only valid between steps.
+    # set_state puts a world on the same table back exactly where this one was, so stepping both
+    # with the same inputs gives the same results (replay.py).
+    def get_state(self):
+        index = {id(obj): i for i, obj in enumerate(self.bodies())}
+        particles = self.particles
+        return {
+            "score": self.score,
+            "balls_left": self.balls_left,
+            "no_bonus_ball": self.no_bonus_ball,
+            "game_over": self.game_over,
+            "timers": self.timers.get_state(),
+            "light_chase": self.light_chase.get_state(),
+            "balls": [[ball.pos.x, ball.pos.y, ball.vel.x, ball.vel.y, ball.angle, ball.avel, ball.awake,
+                       particles.sleep_timer[ball.index].item(), list(ball.color), ball.width] for ball in self.balls],
+            "ball_in_play2": None if self.ball_in_play2 is None else self.balls.index(self.ball_in_play2),
+            "moving_walls": [[wall.pos.x, wall.pos.y, wall.vel.x, wall.vel.y, wall.angle, wall.avel]
+                             for wall in self.moving_walls],
+            "flashing_gfx": [list(obj.color) for obj in self.flashing_gfx],
+            "sensors": self.sensors.get_state(self.balls),
+            "touching": [[self.balls.index(a), self.balls.index(b)] for a, b in self.touching],
+            "contacts": self.contacts.get_state(index),
+        }
+
+    def set_state(self, state):
+        self.score = state["score"]
+        self.balls_left = state["balls_left"]
+        self.no_bonus_ball = state["no_bonus_ball"]
+        self.game_over = state["game_over"]
+        self.timers.set_state(state["timers"])
+        self.light_chase.set_state(state["light_chase"])
+
+        # Same number of balls first, so the bodies line up with the saved contacts
+        while len(self.balls) > len(state["balls"]):
+            self.remove_ball(self.balls[-1])
+        while len(self.balls) < len(state["balls"]):
+            self.add_ball((0, 0))
+        for ball, (x, y, vx, vy, angle, avel, awake, sleep_timer, color, width) in zip(self.balls, state["balls"]):
+            ball.pos = (x, y)
+            ball.vel = (vx, vy)
+            ball.angle = angle
+            ball.avel = avel
+            ball.awake = awake
+            self.particles.sleep_timer[ball.index] = sleep_timer
+            ball.color = color
+            ball.width = width
+        second = state["ball_in_play2"]
+        self.ball_in_play2 = None if second is None else self.balls[second]
+
+        for wall, (x, y, vx, vy, angle, avel) in zip(self.moving_walls, state["moving_walls"]):
+            wall.pos = Vector2(x, y)
+            wall.vel = Vector2(vx, vy)
+            wall.angle = angle
+            wall.avel = avel
+        self.moving_edges.transform()
+
+        self.sensors.set_state(state["sensors"], self.balls)
+        for obj, color in zip(self.flashing_gfx, state["flashing_gfx"]):
+            obj.color = color
+        self.ball_arm.pos = self.ball_in_play.pos
+        self.ball_arm.angle = self.ball_in_play.angle
+
+        self.touching = [(self.balls[a], self.balls[b]) for a, b in state["touching"]]
+        self.contacts.set_state(state["contacts"], self.bodies())
+
+    ## Sleeping
+    def awake_balls(self):
+        return [ball for ball in self.balls if ball.awake]
+
+    # Group the balls into islands of balls touching each other (union-find) | returns {id(ball): island}
+    def islands(self):
+        parent = {id(ball): ball for ball in self.balls}
+        def find(ball):
+            while parent[id(ball)] is not ball:
+                parent[id(ball)] = parent[id(parent[id(ball)])]
+                ball = parent[id(ball)]
+            return ball
+        for a, b in self.touching:
+            root_a = find(a)
+            root_b = find(b)
+            if root_a is not root_b:
+                parent[id(root_a)] = root_b
+        return {id(ball): id(find(ball)) for ball in self.balls}
+
+    # Wake a ball and everything in its island
+    def wake(self, ball):
+        if ball.system is None:
+            return
+        islands = self.islands()
+        island = islands.get(id(ball))
+        for other in self.balls:
+            if islands[id(other)] == island and not other.awake:
+                self.particles.wake(other.index)
+        self.particles.wake(ball.index)
+
+    # Put islands to sleep once every ball in them has been still for long enough
+    def update_sleep(self, dt):
+        ready = self.particles.sleep_candidates(dt, sleep_linear_speed, sleep_angular_speed, time_to_sleep)
+        islands = self.islands()
+        restless = {islands[id(ball)] for ball in self.balls if ball.awake and not ready[ball.index]}
+        for ball in self.balls:
+            if ball.awake and islands[id(ball)] not in restless:
+                self.particles.sleep(ball.index)
+
+    # A flipper or the plunger that moved this step wakes any sleeping ball it was or is now touching
+    # (boxes are from before the move, so a plunger pulled out from under a ball still wakes it)
+    def wake_near_moving_walls(self, boxes):
+        for wall, box in zip(self.moving_walls, boxes):
+            if wall.aabb() == box:
+                continue
+            moved = union_box(box, wall.aabb())
+            for ball in self.balls:
+                if not ball.awake and boxes_overlap(swept_box(ball.pos, ball.radius, (0, 0), contact_margin), moved):
+                    self.wake(ball)
+
+    # I put all of the controls in a single function. I would split these into multiple functions normally.
+    def apply_inputs(self, inputs, dt=tuning_dt):
+        rate = dt / tuning_dt
+        plunger = self.plunger
+        left_flipper = self.left_flipper
+        right_flipper = self.right_flipper
+
+        # Plunger control
+        if inputs.plunger:
+            if plunger.pos.y < plunger_y_min:
+                plunger.vel = Vector2(0, 150)
+            else:
+                plunger.vel = Vector2(0,0)
+
+        elif (not inputs.plunger):
+            if plunger.pos.y > plunger_y_max:
+                plunger.vel.y -= self.plunger_accel * rate
+            elif plunger.pos.y <= plunger_y_max and plunger.vel != Vector2(0,0):
+                plunger.vel = Vector2(0,0)
+
+        # Paddle controls
+        # Prevent the paddle from swinging too far
+        if left_flipper.angle <= convert_degree(-flipper_max_angle):
+            left_flipper.angle = convert_degree(-flipper_max_angle)
+        if left_flipper.angle >= convert_degree(flipper_angle):
+            left_flipper.angle = convert_degree(flipper_angle)
+        if right_flipper.angle >= convert_degree(flipper_max_angle):
+            right_flipper.angle = convert_degree(flipper_max_angle)
+        if right_flipper.angle <= convert_degree(-flipper_angle):
+            right_flipper.angle = convert_degree(-flipper_angle)
+            # Simplify this code
+
+        if inputs.left_flipper:
+            if left_flipper.angle > convert_degree(-flipper_max_angle):
+                left_flipper.avel += -self.flipper_ang_accel * rate
+            else:
+                left_flipper.avel = 0
+        elif (not inputs.left_flipper):
+            if left_flipper.angle < convert_degree(flipper_angle):
+                left_flipper.avel += self.flipper_ang_decel * rate
+            else:
+                left_flipper.avel = 0
+
+        if inputs.right_flipper:
+            if right_flipper.angle < convert_degree(flipper_max_angle):
+                right_flipper.avel += self.flipper_ang_accel * rate
+            else:
+                right_flipper.avel = 0
+        elif (not inputs.right_flipper):
+            if right_flipper.angle > convert_degree(-flipper_angle):
+                right_flipper.avel += -self.flipper_ang_decel * rate
+            else:
+                right_flipper.avel = 0
+
+    # Box around where each ball could go this step
+    def ball_boxes(self, balls, dt):
+        return [swept_box(ball.pos, ball.radius, ball.vel * dt, contact_margin) for ball in balls]
+
+    # Ask a tree what is near each ball this step.
+    # Polygons packed in `edges` all go through the batched kernel in one call and come back as contacts
+    # (only the ones that are touching). Anything else comes back as (shape, ball) pairs.
+    def gather_contacts(self, tree, edges, balls, boxes):
+        pair_ball = []
+        pair_poly = []
+        others = []
+        for b, (ball, box) in enumerate(zip(balls, boxes)):
+            for i in tree.query_indices(box):
+                shape = tree.items[i]
+                slot = edges.slot.get(id(shape))
+                if slot is None:
+                    others.append((shape, ball))
+                else:
+                    pair_ball.append(b)
+                    pair_poly.append(slot)
+
+        return self.polygon_contacts(edges, balls, pair_ball, pair_poly), others
+
+    # Same thing for the moving walls | every ball whose box touches one's goes through the kernel
+    # against the posed VertexBuffer
+    def gather_moving_contacts(self, balls, boxes):
+        pair_ball = []
+        pair_poly = []
+        edges = self.moving_edges
+        for b, box in enumerate(boxes):
+            for k, wall in enumerate(edges.polygons):
+                if boxes_overlap(box, wall.box):
+                    pair_ball.append(b)
+                    pair_poly.append(k)
+
+        return self.polygon_contacts(edges, balls, pair_ball, pair_poly)
+
+    # The kernel over the (ball, polygon) pairs found, each starting from the side it had last step
+    # (ContactManager.side_hints) | returns the touching ones as contacts
+    def polygon_contacts(self, edges, balls, pair_ball, pair_poly):
+        self.profiler.count("pairs_tested", len(pair_ball))
+        contacts = []
+        if pair_ball:
+            keys = [(id(balls[b]), id(edges.polygons[k])) for b, k in zip(pair_ball, pair_poly)]
+            centers = self.particles.pos[[ball.index for ball in balls]]
+            radii = [ball.radius for ball in balls]
+            found = circle_polygon_contacts(centers, radii, edges, pair_ball, pair_poly, self.contacts.side_hints(keys))
+            self.contacts.keep_sides(keys, found.side.tolist())
+            for k in np.flatnonzero(found.overlap >= 0):
+                contacts.append(self.contacts.precomputed(balls[found.ball[k]], edges.polygons[found.polygon[k]],
+                                                          found.overlap[k], found.normal[k], found.point[k]))
+        return contacts
+
+    # Every pair of balls that touches | two sleeping balls are left alone (and stay in the same island).
+    # An awake ball touching a sleeping one wakes its whole island.
+    def gather_ball_contacts(self):
+        touching = self.touching
+        self.touching = []
+        contacts = []
+        for a, b in combinations(self.balls, 2):
+            if not (a.awake or b.awake):
+                if (a, b) in touching:
+                    self.touching.append((a, b))
+                continue
+            c = self.contacts.get(a, b)
+            if c.overlap() < 0:
+                continue
+            self.touching.append((a, b))
+            if not (a.awake and b.awake):
+                self.wake(b if a.awake else a)
+            contacts.append(c)
+        return contacts
+
+    # Earliest touch between a ball moving from p by d and anything on the table
+    # Returns (t, normal, shape) or None
+    def first_impact(self, p, d, r):
+        box = swept_box(p, r, d, contact_margin)
+        first = None
+        for shape in self.wall_tree.query(box) + self.moving_walls + self.bumper_tree.query(box):
+            if shape is self.one_way_gate:
+                continue
+            hit = time_of_impact(p, d, r, shape)
+            if hit is not None and (first is None or hit[0] < first[0]):
+                first = (hit[0], hit[1], shape)
+        return first
+
+    # Any ball that moved far this step is moved again from its start, stopping at the first thing it hits.
+    # There it bounces the same way the contacts would bounce it, and carries on for the rest of the step.
+    def sweep_fast_balls(self, start, dt):
+        for ball in self.balls:
+            x0, y0 = start[ball.index].tolist()
+            pos = ball.pos
+            r = ball.radius
+            d = (pos.x - x0, pos.y - y0)
+            if d[0] * d[0] + d[1] * d[1] <= (ccd_threshold * r) ** 2:
+                continue
+
+            p = (x0, y0)
+            vel = ball.vel
+            moved = False
+            for _ in range(ccd_iterations):
+                hit = self.first_impact(p, d, r)
+                if hit is None:
+                    p = (p[0] + d[0], p[1] + d[1])
+                    moved = True
+                    break
+                t, (nx, ny), shape = hit
+                p = (p[0] + d[0] * t + nx * ccd_skin, p[1] + d[1] * t + ny * ccd_skin)
+
+                # Velocity relative to the surface at the point of contact (flippers and the plunger move)
+                sx = p[0] - nx * r - shape.pos.x
+                sy = p[1] - ny * r - shape.pos.y
+                vx = vel.x - (shape.vel.x - shape.avel * sy)
+                vy = vel.y - (shape.vel.y + shape.avel * sx)
+                vn = vx * nx + vy * ny
+                if vn < 0:
+                    restitution, friction, rebound, points = self.materials.pair(ball, shape)
+                    if rebound:
+                        dv = -vn + rebound
+                    else:
+                        dv = -(1 + restitution) * vn
+                    vel = Vector2(vel.x + dv * nx, vel.y + dv * ny)
+                remaining = (1 - t) * dt
+                d = (vel.x * remaining, vel.y * remaining)
+
+            if moved or p != (x0, y0):
+                ball.pos = p
+                ball.vel = vel
+
+    # Advance the whole table by dt seconds
+    def step(self, dt, inputs):
+        profiler = self.profiler
+        if self.balls_left < 0:
+            self.game_over = True
+
+        # KEY STATE
+        self.apply_inputs(inputs, dt)
+        profiler.lap("input")
+
+        # CONTACTS
+        # Everything the balls touch this step (walls, flippers, bumpers, each other) is gathered first, then
+        # resolved in one pass by the contact kernel, each contact by its pair of materials
+        # Only the shapes near where each ball is going this step get a full contact test
+        # Sleeping balls aren't tested at all
+        balls = self.awake_balls()
+        boxes = self.ball_boxes(balls, dt)
+        contacts, others = self.gather_contacts(self.wall_tree, self.wall_edges, balls, boxes)
+        contacts += [self.contacts.get(wall, ball) for wall, ball in others]
+        contacts += self.gather_moving_contacts(balls, boxes)
+        profiler.count("pairs_tested", len(others))
+        profiler.lap("wall_contacts")
+
+        bumper_contacts, others = self.gather_contacts(self.bumper_tree, self.bumper_edges, balls, boxes)
+        contacts += bumper_contacts
+        contacts += [self.contacts.get(obj, ball) for obj, ball in others]
+        profiler.count("pairs_tested", len(others))
+        profiler.lap("bumper_contacts")
+
+        contacts += self.gather_ball_contacts()
+        profiler.count("pairs_tested", len(self.balls) * (len(self.balls) - 1) // 2)
+        profiler.lap("ball_contacts")
+
+        resolved, score = resolve_contacts(contacts, self.materials.pairs, self.contacts)
+        self.score += score
+        self.contacts.end_step()
+        profiler.count("contacts_resolved", resolved)
+
+        # Balls that have come to rest go to sleep
+        # (checked after the contacts, before gravity adds another step's worth of speed to resting balls)
+        self.update_sleep(dt)
+        profiler.lap("resolve")
+
+        # Score pads and the teleporter | only the sensors near a ball are tested, and only balls coming in
+        # (or, for the teleporter, staying in) do anything
+        tested = self.sensors.update(balls, boxes)
+
+        # Check for multi-ball play
+        if self.score > 300 and self.no_bonus_ball:
+            self.ball_in_play2 = self.add_ball(self.multiball_pos, color=ball_color2, width=0)
+            self.no_bonus_ball = False
+        profiler.count("pairs_tested", tested)
+        profiler.lap("sensors")
+
+        # PHYSICS
+        # Clear force from all particles
+        # Static table pieces never move, so they are skipped entirely
+        # Anything in the particle system is cleared and integrated in one batch
+        self.particles.clear_forces()
+        for obj in self.objects:
+            if obj.body_type != STATIC and obj.system is None:
+                obj.clear_force()
+
+        # Add forces
+        self.gravity.apply()
+        profiler.lap("forces")
+
+        # Update particles
+        start = self.particles.pos.copy()
+        wall_boxes = [wall.aabb() for wall in self.moving_walls]
+        self.particles.integrate(dt)
+        for obj in self.objects:
+            if obj.body_type != STATIC and obj.system is None:
+                obj.update(dt)
+        self.moving_edges.transform()
+
+        # Fast balls get swept from where they started so they can't jump through thin walls
+        self.sweep_fast_balls(start, dt)
+
+        # Flipper and plunger motion wakes sleeping balls back up
+        self.wake_near_moving_walls(wall_boxes)
+        profiler.lap("integration")
+
+        # Checking if pinball has fallen out of the game
+        if self.ball_in_play.pos.y > height:
+            # Reset the ball and the teleporter
+            self.balls_left-=1
+            if self.balls_left >= 0:
+                self.reset_ball()
+                self.teleporter.enable()
+            else:
+                self.ball_in_play.pos = Vector2(0,0)
+                self.ball_in_play.vel = Vector2(0,0)
+
+        ## Timers | light shows (and anything else waiting on the clock) that came due this step
+        self.timers.advance(dt)
+
+        # Set any moving GFX
+        self.ball_arm.pos = self.ball_in_play.pos
+        self.ball_arm.angle = self.ball_in_play.angle
+
+        for obj in self.gfx_objs:
+            if obj.body_type != STATIC:
+                obj.update(dt)
+        # The drain check and the lights count as sensors too
+        profiler.lap("sensors")